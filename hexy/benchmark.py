@@ -0,0 +1,179 @@
+""" Runs every motion routine against the simulated bus and a virtual clock and reports,
+    per routine, I2C transactions, bytes on the wire, modeled bus time against sleep time
+    and Python CPU time per frame.
+
+    python -m hexy.benchmark
+    python -m hexy.benchmark --save baseline.json
+    python -m hexy.benchmark --compare baseline.json """
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from .comm import clock as clocks
+from .comm.i2c import Adafruit_I2C
+from .comm.i2cdev import I2CDevBus
+from .comm.pwm import PWM
+from .comm.sim import SimulatedBus, BusTiming
+
+ROUTINES = [
+    'boot_up', 'shut_down', 'curl_up', 'lie_flat', 'lie_down', 'get_up', 'look',
+    'twist_hip', 'squat', 'walk', 'rotate', 'tilt_side', 'tilt', 'default',
+    'shake_head', 'point', 'wave', 'dance_twist', 'lean_back', 'type_stuff',
+    'tilt_left_and_right', 'tilt_front_and_back', 'dance_tilt', 'rock_body',
+    'prepare', 'night_fever', 'thriller'
+]
+
+ARGUMENTS = {'squat': {'angle': 40}}
+
+METRICS = ['transactions', 'bytes', 'bus_time', 'sleep_time', 'missed', 'frames', 'cpu_per_frame']
+
+# cpu time is noisy, so it gets a wider margin before counting as a regression
+TOLERANCES = {'cpu_per_frame': 0.5}
+
+
+def run(routines = ROUTINES, timing = None, rdwr = False):
+    """ returns routine : metrics for each routine, every routine starts from
+        the default pose except boot_up which starts from a limp robot. with rdwr
+        the chips are written through I2CDevBus on a stand-in device file.
+
+        the drivers and the broadcast devices are opened afresh on the benchmark's bus,
+        the clock, bus and devices in use before are restored afterwards """
+
+    from .robot.core import Drivers
+
+    saved = (clocks.current, Adafruit_I2C.busFactory, dict(SimulatedBus.installed),
+             PWM.allcall_i2c, PWM.general_call_i2c)
+    device = path = None
+
+    try:
+        # time only moves by the requested sleeps and by the bus time the simulation models
+        clock = clocks.VirtualClock().install()
+        bus = SimulatedBus(timing = timing or BusTiming(), clock = clock).install()
+        PWM.allcall_i2c, PWM.general_call_i2c = {}, None
+
+        if rdwr:
+            handle, path = tempfile.mkstemp(prefix = 'i2c-')
+            os.close(handle)
+            device = I2CDevBus(1, path = path, ioctl = bus.ioctl)
+            Adafruit_I2C.setBusFactory(lambda busnum: device)
+
+        return measure(routines, bus, clock, Drivers())
+
+    finally:
+        if device is not None: device.close()
+        if path is not None: os.remove(path)
+
+        previous, factory, installed, PWM.allcall_i2c, PWM.general_call_i2c = saved
+        previous.install()
+        Adafruit_I2C.busFactory = staticmethod(factory)
+        SimulatedBus.installed.clear()
+        SimulatedBus.installed.update(installed)
+
+
+def measure(routines, bus, clock, drivers):
+    """ the metrics of each routine run by a DancingHexapod on drivers """
+
+    from .robot import dancing
+
+    results = {}
+
+    for name in routines:
+
+        hexy = dancing.DancingHexapod(drivers = drivers)
+        if name != 'boot_up': hexy.default()
+
+        frames = []
+
+        def counted(pulses, output = hexy.state.output):
+            frames.append(len(pulses))
+            output(pulses)
+
+        hexy.state.output = counted
+
+        bus.clear()
+        clock.slept = 0.0
+        hexy.scheduler.restart()
+        hexy.scheduler.reset_stats()
+        start = time.clock()
+
+        getattr(hexy, name)(**ARGUMENTS.get(name, {}))
+
+        cpu = time.clock() - start
+
+        results[name] = {
+            'transactions': len(bus.transactions),
+            'bytes': bus.bytesWritten(),
+            'bus_time': bus.elapsed,
+            'sleep_time': clock.slept,
+            'missed': hexy.scheduler.missed,
+            'frames': len(frames),
+            'cpu_per_frame': cpu / max(len(frames), 1)
+        }
+
+    return results
+
+
+def compare(results, baseline, tolerance = 0.05):
+    """ returns (routine, metric, old, new) for every metric that grew beyond the tolerance """
+
+    regressions = []
+
+    for name in sorted(results):
+        if name not in baseline: continue
+
+        for metric in METRICS:
+            old, new = baseline[name][metric], results[name][metric]
+            if new > old * (1 + TOLERANCES.get(metric, tolerance)) and new - old > 1e-9:
+                regressions.append((name, metric, old, new))
+
+    return regressions
+
+
+def report(results, out = sys.stdout):
+
+    out.write('%-20s %6s %7s %9s %9s %6s %6s %12s\n' %
+              ('routine', 'trans', 'bytes', 'bus ms', 'sleep ms', 'missed', 'frames', 'cpu us/frame'))
+
+    for name in sorted(results):
+        r = results[name]
+        out.write('%-20s %6d %7d %9.2f %9.1f %6d %6d %12.1f\n' %
+                  (name, r['transactions'], r['bytes'], r['bus_time'] * 1000,
+                   r['sleep_time'] * 1000, r['missed'], r['frames'], r['cpu_per_frame'] * 1e6))
+
+
+def main(argv = None):
+
+    parser = argparse.ArgumentParser(description = 'hexy routine benchmarks on a simulated bus')
+    parser.add_argument('routines', nargs = '*', default = ROUTINES)
+    parser.add_argument('--clock', type = int, default = 100000, help = 'I2C clock in Hz')
+    parser.add_argument('--overhead', type = float, default = 0.00005, help = 'seconds per transaction')
+    parser.add_argument('--save', metavar = 'FILE', help = 'write the results as a JSON baseline')
+    parser.add_argument('--compare', metavar = 'FILE', help = 'flag regressions against a JSON baseline')
+    parser.add_argument('--tolerance', type = float, default = 0.05)
+    parser.add_argument('--rdwr', action = 'store_true', help = 'write through the raw I2C_RDWR transport')
+    args = parser.parse_args(argv)
+
+    results = run(args.routines, BusTiming(args.clock, args.overhead), args.rdwr)
+    report(results)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent = 2, sort_keys = True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+
+        for name, metric, old, new in regressions:
+            print '%s: %s regressed from %.6g to %.6g' % (name, metric, old, new)
+
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
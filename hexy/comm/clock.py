@@ -0,0 +1,66 @@
+#!/usr/bin/python
+
+import time
+
+# ============================================================================
+# Clocks behind every wait and timestamp, real time or a virtual time that
+# only moves when something waits, for runs faster than real time
+# ============================================================================
+
+class RealClock(object):
+  "Wall time, the default"
+
+  def time(self):
+    return time.time()
+
+  def sleep(self, seconds):
+    if seconds > 0:
+      time.sleep(seconds)
+
+  def wait(self, event, seconds):
+    "Waits up to seconds for a threading.Event, returns whether it is set"
+    return event.wait(seconds)
+
+  def install(self):
+    "Makes this the clock of everything not given one explicitly"
+    global current
+    current = self
+    return self
+
+
+class VirtualClock(RealClock):
+  "Time that only moves when slept through or advanced, so every wait returns at once"
+
+  # Time stays put while Python runs, so timestamps are exactly the sum of the
+  # waits before them and runs are repeatable. A SimulatedBus created with this
+  # clock also advances it by the modeled time of each transaction.
+
+  def __init__(self, start=0.0):
+    self.now = start
+    self.slept = 0.0          # seconds passed in sleep and wait
+    self.sleeps = 0
+
+  def time(self):
+    return self.now
+
+  def sleep(self, seconds):
+    if seconds > 0:
+      self.now += seconds
+      self.slept += seconds
+      self.sleeps += 1
+
+  def wait(self, event, seconds):
+    if not event.is_set():
+      self.sleep(seconds)
+    return event.is_set()
+
+  def advance(self, seconds):
+    "Moves time on without counting it as sleep, e.g. for modeled bus time"
+    self.now += seconds
+
+
+current = RealClock()
+
+def now():
+  "The time of the current clock"
+  return current.time()
@@ -1,6 +1,14 @@
 #!/usr/bin/python
 import re
-import smbus
+
+smbuses = {}
+
+def openSMBus(busnum):
+  "Opens /dev/i2c-<busnum> through smbus, the default bus backend, once per bus number"
+  if busnum not in smbuses:
+    import smbus
+    smbuses[busnum] = smbus.SMBus(busnum)
+  return smbuses[busnum]
 
 # ===========================================================================
 # Adafruit_I2C Class
@@ -8,9 +16,27 @@ import smbus
 
 class Adafruit_I2C(object):
 
+  # Called with a bus number, returns an object with the smbus.SMBus methods.
+  # Replace it (see setBusFactory) to run against another transport or a simulation.
+  busFactory = staticmethod(openSMBus)
+
+  @classmethod
+  def setBusFactory(cls, factory):
+    "Sets the bus backend used by instances created afterwards, None restores smbus"
+    cls.busFactory = staticmethod(factory or openSMBus)
+
+  piRevision = None     # cached by getPiRevision so /proc/cpuinfo is parsed once
+
   @staticmethod
   def getPiRevision():
     "Gets the version number of the Raspberry Pi board"
+    if Adafruit_I2C.piRevision is None:
+      Adafruit_I2C.piRevision = Adafruit_I2C.readPiRevision()
+    return Adafruit_I2C.piRevision
+
+  @staticmethod
+  def readPiRevision():
+    "Parses the board revision out of /proc/cpuinfo"
     # Revision list available at: http://elinux.org/RPi_HardwareHistory#Board_Revision_History
     try:
       with open('/proc/cpuinfo', 'r') as infile:
@@ -34,14 +60,18 @@ class Adafruit_I2C(object):
     # Gets the I2C bus number /dev/i2c#
     return 1 if Adafruit_I2C.getPiRevision() > 1 else 0
 
-  def __init__(self, address, busnum=-1, debug=False):
+  def __init__(self, address, busnum=-1, debug=False, bus=None):
     self.address = address
     # By default, the correct I2C bus is auto-detected using /proc/cpuinfo
     # Alternatively, you can hard-code the bus version below:
     # self.bus = smbus.SMBus(0); # Force I2C0 (early 256MB Pi's)
     # self.bus = smbus.SMBus(1); # Force I2C1 (512MB Pi's)
-    self.bus = smbus.SMBus(busnum if busnum >= 0 else Adafruit_I2C.getPiI2CBusNumber())
+    # or pass an already opened backend as bus.
+    if bus is None:
+      bus = self.busFactory(busnum if busnum >= 0 else Adafruit_I2C.getPiI2CBusNumber())
+    self.bus = bus
     self.debug = debug
+    self.errors = 0       # failed transactions, counted by errMsg
 
   def reverseByteOrder(self, data):
     "Reverses the byte order of an int (16-bit) or long (32-bit) value"
@@ -54,7 +84,13 @@ class Adafruit_I2C(object):
     return val
 
   def errMsg(self):
-    print "Error accessing 0x%02X: Check your I2C address" % self.address
+    "Counts a failed transaction and reports it to the active tracer, printing it only with debug"
+    self.errors += 1
+    import trace                # here, as trace imports this module
+    if trace.active is not None:
+      trace.active.failure(self.address, isinstance(self.bus, trace.InstrumentedBus))
+    if (self.debug):
+      print "Error accessing 0x%02X: Check your I2C address" % self.address
     return -1
 
   def write8(self, reg, value):
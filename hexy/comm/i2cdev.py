@@ -0,0 +1,138 @@
+#!/usr/bin/python
+
+import ctypes
+import fcntl
+import os
+import threading
+
+# ============================================================================
+# Raw /dev/i2c-N transport issuing I2C_RDWR ioctls from preallocated buffers
+# ============================================================================
+
+I2C_RDWR = 0x0707           # combined transfer, from linux/i2c-dev.h
+I2C_M_RD = 0x0001           # message flag: read from the device
+
+class i2c_msg(ctypes.Structure):
+  _fields_ = [('addr', ctypes.c_uint16), ('flags', ctypes.c_uint16),
+              ('len', ctypes.c_uint16), ('buf', ctypes.POINTER(ctypes.c_uint8))]
+
+class i2c_rdwr_ioctl_data(ctypes.Structure):
+  _fields_ = [('msgs', ctypes.POINTER(i2c_msg)), ('nmsgs', ctypes.c_uint32)]
+
+
+devBuses = {}
+
+def i2cDevBus(busnum):
+  "Bus factory opening /dev/i2c-<busnum> as an I2CDevBus, once per bus number"
+  if busnum not in devBuses:
+    devBuses[busnum] = I2CDevBus(busnum)
+  return devBuses[busnum]
+
+
+class I2CDevBus(object):
+  "Stand-in for smbus.SMBus writing to /dev/i2c-N with I2C_RDWR, without the 32 byte block limit"
+
+  # Install it with Adafruit_I2C.setBusFactory(i2cDevBus), write8, writeList, readU8 and
+  # readList keep working as they are. A block write can carry a whole PCA9685, 64 LED
+  # bytes, and writeBlocks sends several chips as the messages of a single ioctl.
+  # path and ioctl can be replaced to run against a fake device file, e.g.
+  # I2CDevBus(1, path='/tmp/i2c-1', ioctl=SimulatedBus().ioctl).
+  # Transfers through the shared buffers hold a lock from filling them to the ioctl.
+  # write_byte_data, which write8 and PWM.emergencyStop use, fills a message of its own
+  # instead and takes no lock, so a stop from another thread or a signal handler goes
+  # out as it is even in the middle of another transfer.
+
+  blockLimit = 256            # data bytes per message, the register byte comes on top
+  maxMessages = 4             # messages per ioctl, the kernel takes up to 42
+
+  def __init__(self, busnum, path=None, ioctl=fcntl.ioctl):
+    self.busnum = busnum
+    self.path = path or '/dev/i2c-%d' % busnum
+    self.ioctl = ioctl
+    self.fd = os.open(self.path, os.O_RDWR)
+    self.buffers = [(ctypes.c_uint8 * (self.blockLimit + 1))() for i in range(self.maxMessages)]
+    self.messages = (i2c_msg * self.maxMessages)()
+    for message, buffer in zip(self.messages, self.buffers):
+      message.buf = ctypes.cast(buffer, ctypes.POINTER(ctypes.c_uint8))
+    self.request = i2c_rdwr_ioctl_data(self.messages, 0)
+    self.lock = threading.Lock()
+
+  def close(self):
+    if self.fd is not None:
+      os.close(self.fd)
+      self.fd = None
+
+  def __message(self, i, address, data=None, length=0):
+    "Fills message i with a write of data, or with a read of length bytes when data is None"
+    message = self.messages[i]
+    message.addr = address
+    if data is None:
+      message.flags, message.len = I2C_M_RD, length
+    else:
+      if len(data) > self.blockLimit + 1:
+        raise OverflowError('message of %d bytes exceeds the %d byte buffer' % (len(data), self.blockLimit + 1))
+      message.flags, message.len = 0, len(data)
+      self.buffers[i][:len(data)] = data
+
+  def __transfer(self, count):
+    self.request.nmsgs = count
+    self.ioctl(self.fd, I2C_RDWR, self.request)
+
+  def __read(self, i, length):
+    return self.buffers[i][:length]
+
+  def writeBlocks(self, blocks):
+    "Writes [(address, register, data)] as the messages of as few ioctls as possible"
+    for start in range(0, len(blocks), self.maxMessages):
+      chunk = blocks[start:start + self.maxMessages]
+      with self.lock:
+        for i, (address, reg, data) in enumerate(chunk):
+          self.__message(i, address, [reg] + list(data))
+        self.__transfer(len(chunk))
+
+  def write_byte(self, address, value):
+    with self.lock:
+      self.__message(0, address, [value])
+      self.__transfer(1)
+
+  def write_byte_data(self, address, reg, value):
+    "Writes one register from a message of its own, without the lock"
+    buffer = (ctypes.c_uint8 * 2)(reg & 0xFF, value & 0xFF)
+    message = i2c_msg(address, 0, 2, ctypes.cast(buffer, ctypes.POINTER(ctypes.c_uint8)))
+    self.ioctl(self.fd, I2C_RDWR, i2c_rdwr_ioctl_data(ctypes.pointer(message), 1))
+
+  def write_word_data(self, address, reg, value):
+    with self.lock:
+      self.__message(0, address, [reg, value & 0xFF, (value >> 8) & 0xFF])
+      self.__transfer(1)
+
+  def write_i2c_block_data(self, address, reg, data):
+    with self.lock:
+      self.__message(0, address, [reg] + list(data))
+      self.__transfer(1)
+
+  def read_byte(self, address):
+    with self.lock:
+      self.__message(0, address, length=1)
+      self.__transfer(1)
+      return self.__read(0, 1)[0]
+
+  def readRegisters(self, address, reg, length):
+    "Writes the register pointer and reads length bytes back, with a repeated start in between"
+    with self.lock:
+      self.__message(0, address, [reg])
+      self.__message(1, address, length=length)
+      self.__transfer(2)
+      return self.__read(1, length)
+
+  def read_byte_data(self, address, reg):
+    return self.readRegisters(address, reg, 1)[0]
+
+  def read_word_data(self, address, reg):
+    low, high = self.readRegisters(address, reg, 2)
+    return low | high << 8
+
+  def read_i2c_block_data(self, address, reg, length=32):
+    if length > self.blockLimit + 1:
+      raise OverflowError('read of %d bytes exceeds the %d byte buffer' % (length, self.blockLimit + 1))
+    return self.readRegisters(address, reg, length)
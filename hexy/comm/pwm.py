@@ -1,7 +1,7 @@
 #!/usr/bin/python
 
-import time
 import math
+import clock
 from i2c import Adafruit_I2C
 
 # ============================================================================
@@ -28,33 +28,92 @@ class PWM :
   # Bits
   __RESTART            = 0x80
   __SLEEP              = 0x10
+  __AI                 = 0x20
   __ALLCALL            = 0x01
   __INVRT              = 0x10
   __OUTDRV             = 0x04
+  __FULL               = 0x10                     # bit 4 of LEDn_ON_H / LEDn_OFF_H
 
-  general_call_i2c = Adafruit_I2C(0x00)
+  # LED All Call address every chip with the ALLCALL bit set answers to
+  ALLCALL_ADDRESS      = 0x70
+
+  general_call_i2c = None                       # opened by the first softwareReset
+  allcall_i2c = {}                              # busnum : Adafruit_I2C at ALLCALL_ADDRESS
 
   @classmethod
   def softwareReset(cls):
-    "Sends a software reset (SWRST) command to all the servo drivers on the bus"
+    "Sends a software reset (SWRST) command to all the servo drivers on the bus, call invalidateShadow on each driver afterwards"
+    if cls.general_call_i2c is None:
+      cls.general_call_i2c = Adafruit_I2C(0x00)
     cls.general_call_i2c.writeRaw8(0x06)        # SWRST
 
-  def __init__(self, address=0x40, debug=False):
-    self.i2c = Adafruit_I2C(address)
+  @classmethod
+  def allCall(cls, busnum=-1):
+    "The ALLCALL device of a bus, opened once so a signal handler can use it right away"
+    if busnum not in cls.allcall_i2c:
+      cls.allcall_i2c[busnum] = Adafruit_I2C(cls.ALLCALL_ADDRESS, busnum)
+    return cls.allcall_i2c[busnum]
+
+  @classmethod
+  def broadcastAllPWM(cls, on, off, busnum=-1):
+    "Sets every channel of every chip on the bus with one ALLCALL write, call assumeAllPWM on each driver afterwards"
+    return cls.allCall(busnum).writeList(cls.__ALL_LED_ON_L,
+                                         [on & 0xFF, on >> 8, off & 0xFF, off >> 8])
+
+  @classmethod
+  def emergencyStop(cls, busnum=-1):
+    "Turns every channel of every chip on the bus fully off with a single one-byte ALLCALL write"
+    return cls.allCall(busnum).write8(cls.__ALL_LED_OFF_H, cls.__FULL)
+
+  @staticmethod
+  def setPWMsTogether(writes):
+    "Sets [(driver, pulses)] of chips sharing a bus in one transfer, returns False when their bus can't"
+    bus = writes[0][0].i2c.bus
+    if not hasattr(bus, 'writeBlocks') or any(driver.i2c.bus is not bus for driver, _ in writes):
+      return False
+    blocks = []
+    for driver, pulses in writes:
+      blocks += [(driver.address, reg, data) for reg, data in driver.planPWMs(pulses)]
+    if not blocks:
+      return True
+    try:
+      bus.writeBlocks(blocks)
+    except IOError, err:
+      for driver, _ in writes:
+        driver.i2c.errMsg()
+        driver.invalidateShadow()
+    return True
+
+  def __init__(self, address=0x40, debug=False, warm=False, busnum=-1):
+    self.i2c = Adafruit_I2C(address, busnum)
     self.i2c.debug = debug
+    # channels per block write, 8 on SMBus whose blocks carry at most 32 data bytes
+    self.blockChannels = min(16, getattr(self.i2c.bus, 'blockLimit', 32) // 4)
     self.address = address
     self.debug = debug
+    self.shadowHits = 0
+    self.shadowMisses = 0
+    self.invalidateShadow()
+    # A warm start keeps a chip that is already running as it is, outputs included
+    self.warm = warm and self.isRunning()
+    if self.warm:
+      if (self.debug):
+        print "PCA9685 already configured, keeping its outputs"
+      self.readAllPWM()
+      return
     if (self.debug):
-      print "Reseting PCA9685 MODE1 (without SLEEP) and MODE2"
-    self.setAllPWM(0, 0)
+      print "Reseting PCA9685 MODE1 (asleep) and MODE2"
     self.i2c.write8(self.__MODE2, self.__OUTDRV)
-    self.i2c.write8(self.__MODE1, self.__ALLCALL)
-    time.sleep(0.005)                                       # wait for oscillator
+    # Asleep with auto-increment for block writes, so no stale pulse is driven before it is cleared
+    self.i2c.write8(self.__MODE1, self.__ALLCALL | self.__AI | self.__SLEEP)
+    # Only now that AI is set does the 4-byte ALL_LED write reach all four registers
+    self.setAllPWM(0, 0)
+    self.readAllPWM()                             # the shadow as the chip reads back
     
     mode1 = self.i2c.readU8(self.__MODE1)
     mode1 = mode1 & ~self.__SLEEP                 # wake up (reset sleep)
     self.i2c.write8(self.__MODE1, mode1)
-    time.sleep(0.005)                             # wait for oscillator
+    clock.current.sleep(0.005)                    # wait for oscillator
 
   def setPWMFreq(self, freq):
     "Sets the PWM frequency"
@@ -69,33 +128,145 @@ class PWM :
     if (self.debug):
       print "Final pre-scale: %d" % prescale
 
+    if self.warm and self.i2c.readU8(self.__PRESCALE) == int(prescale):
+      return                                      # already running at freq
+
     oldmode = self.i2c.readU8(self.__MODE1);
     newmode = (oldmode & 0x7F) | 0x10             # sleep
     self.i2c.write8(self.__MODE1, newmode)        # go to sleep
     self.i2c.write8(self.__PRESCALE, int(math.floor(prescale)))
     self.i2c.write8(self.__MODE1, oldmode)
-    time.sleep(0.005)
+    clock.current.sleep(0.005)
     self.i2c.write8(self.__MODE1, oldmode | 0x80)
 
+  def isRunning(self):
+    "Tells whether MODE1/MODE2 read back awake and configured the way __init__ leaves them"
+    mode1 = self.i2c.readU8(self.__MODE1)
+    mode2 = self.i2c.readU8(self.__MODE2)
+    if mode1 < 0 or mode2 < 0:
+      return False
+    expected = self.__ALLCALL | self.__AI
+    return mode1 & (self.__SLEEP | expected) == expected and mode2 == self.__OUTDRV
+
+  def readAllPWM(self):
+    "Reads the LED registers in two block reads into the shadow, returns each channel's (on, off)"
+    data = []
+    for channel in range(0, 16, self.blockChannels):
+      block = self.i2c.readList(self.__LED0_ON_L+4*channel, 4*self.blockChannels)
+      if block == -1:
+        self.invalidateShadow()
+        return None
+      data += block
+    self.shadow = data
+    return self.cachedPWM()
+
+  def cachedPWM(self):
+    "Returns each channel's (on, off) from the shadow, without bus traffic, None where unknown"
+    data = self.shadow
+    return [None if None in data[i:i+4] else (data[i] | data[i+1] << 8, data[i+2] | data[i+3] << 8)
+            for i in range(0, 64, 4)]
+
+  def invalidateShadow(self):
+    "Forgets the cached LED registers, e.g. after softwareReset, so the next writes go out"
+    self.shadow = [None] * 64
+
+  def __changed(self, channel, data):
+    "Compares a channel's register bytes with the shadow copy and counts the hit or miss"
+    if self.shadow[4*channel:4*channel+4] == data:
+      self.shadowHits += 1
+      return False
+    self.shadowMisses += 1
+    return True
+
+  def __writeLEDs(self, channel, data):
+    "Block writes LED registers starting at channel and mirrors them in the shadow"
+    if self.i2c.writeList(self.__LED0_ON_L+4*channel, data) == -1:
+      data = [None] * len(data)
+    self.shadow[4*channel:4*channel+len(data)] = data
+
   def setPWM(self, channel, on, off):
     "Sets a single PWM channel"
-    self.i2c.write8(self.__LED0_ON_L+4*channel, on & 0xFF)
-    self.i2c.write8(self.__LED0_ON_H+4*channel, on >> 8)
-    self.i2c.write8(self.__LED0_OFF_L+4*channel, off & 0xFF)
-    self.i2c.write8(self.__LED0_OFF_H+4*channel, off >> 8)
+    data = [on & 0xFF, on >> 8, off & 0xFF, off >> 8]
+    if self.__changed(channel, data):
+      self.__writeLEDs(channel, data)
+
+  def setPWMs(self, pulses):
+    "Sets several channels from a {channel: (on, off)} dict, one block write per run of adjacent channels"
+    for reg, data in self.planPWMs(pulses):
+      if self.i2c.writeList(reg, data) == -1:
+        channel = (reg - self.__LED0_ON_L) // 4
+        self.shadow[4*channel:4*channel+len(data)] = [None] * len(data)
+
+  def planPWMs(self, pulses):
+    "Returns the (register, data) block writes setPWMs makes for pulses, mirroring them in the shadow"
+    # Unchanged channels are dropped, except that a single unchanged channel between
+    # two changed ones is resent: 4 more bytes are cheaper than another transaction.
+    blocks, start, run, gap = [], None, [], []
+    for channel in sorted(pulses):
+      on, off = pulses[channel]
+      data = [on & 0xFF, on >> 8, off & 0xFF, off >> 8]
+      if run and channel != start + (len(run) + len(gap))//4:
+        blocks.append((start, run))
+        run, gap = [], []
+      if not self.__changed(channel, data):
+        if run:
+          gap += data
+          if len(gap) > 4:
+            blocks.append((start, run))
+            run, gap = [], []
+        continue
+      if run and len(run) + len(gap) + 4 > 4*self.blockChannels:
+        blocks.append((start, run))
+        run, gap = [], []
+      if not run:
+        start = channel
+      run += gap + data
+      gap = []
+    if run:
+      blocks.append((start, run))
+    for channel, data in blocks:
+      self.shadow[4*channel:4*channel+len(data)] = data
+    return [(self.__LED0_ON_L+4*channel, data) for channel, data in blocks]
 
   def setAllPWM(self, on, off):
     "Sets a all PWM channels"
-    self.i2c.write8(self.__ALL_LED_ON_L, on & 0xFF)
-    self.i2c.write8(self.__ALL_LED_ON_H, on >> 8)
-    self.i2c.write8(self.__ALL_LED_OFF_L, off & 0xFF)
-    self.i2c.write8(self.__ALL_LED_OFF_H, off >> 8)
+    data = [on & 0xFF, on >> 8, off & 0xFF, off >> 8]
+    if self.shadow == data * 16:
+      self.shadowHits += 16
+      return
+    self.shadowMisses += 16
+    if self.i2c.writeList(self.__ALL_LED_ON_L, data) == -1:
+      self.invalidateShadow()
+    else:
+      self.assumeAllPWM(on, off)
+
+  def assumeAllPWM(self, on, off):
+    "Mirrors in the shadow that every channel was set to (on, off), e.g. by broadcastAllPWM"
+    self.shadow = [on & 0xFF, on >> 8, off & 0xFF, off >> 8] * 16
 
   def getPWM(self, channel):
+     "Reads a channel's four LED registers in one block read, returns off - on"
      if channel > 15:
        return
 
-     on = self.i2c.readU8(self.__LED0_ON_L + 4*channel) + self.i2c.readU8(self.__LED0_ON_H + 4*channel)*256
-     off = self.i2c.readU8(self.__LED0_OFF_L + 4*channel) + self.i2c.readU8(self.__LED0_OFF_H + 4*channel)*256
+     data = self.i2c.readList(self.__LED0_ON_L + 4*channel, 4)
+     if data == -1:
+       return None
+     self.shadow[4*channel:4*channel+4] = data
+
+     on = data[0] + data[1]*256
+     off = data[2] + data[3]*256
 
      return off - on
+
+  def readModes(self):
+    "Reads MODE1 and MODE2 in one block read and PRESCALE, returns them decoded in a dict, None on a bus error"
+    modes = self.i2c.readList(self.__MODE1, 2)
+    prescale = self.i2c.readU8(self.__PRESCALE)
+    if modes == -1 or prescale == -1:
+      return None
+    mode1, mode2 = modes
+    return {'mode1': mode1, 'mode2': mode2, 'prescale': prescale,
+            'frequency': 25000000.0 / 4096 / (prescale + 1),
+            'sleeping': bool(mode1 & self.__SLEEP), 'autoIncrement': bool(mode1 & self.__AI),
+            'allCall': bool(mode1 & self.__ALLCALL)}
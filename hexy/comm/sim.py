@@ -0,0 +1,227 @@
+#!/usr/bin/python
+
+import errno
+from collections import namedtuple
+from i2c import Adafruit_I2C
+from i2cdev import I2C_RDWR, I2C_M_RD
+
+# ============================================================================
+# In-memory PCA9685 devices on a simulated SMBus, for runs without hardware
+# ============================================================================
+
+Transaction = namedtuple('Transaction', 'kind address register data seconds')
+
+class BusTiming(object):
+  "Wall-time model of I2C transactions"
+
+  def __init__(self, clock=100000, overhead=0.00005, blockLimit=32):
+    self.clock = clock                # SCL in Hz, 100 kHz standard or 400 kHz fast mode
+    self.overhead = overhead          # driver and syscall cost per transaction, in seconds
+    self.blockLimit = blockLimit      # most data bytes in one block transfer
+
+  def cost(self, nbytes, restarts=0):
+    "Seconds for a transaction of nbytes bytes, address bytes included"
+    # 9 clocks per byte (8 bits and the ACK), about one clock each for START and STOP
+    return self.overhead + (9 * nbytes + 2 + restarts) / float(self.clock)
+
+
+class SimulatedPCA9685(object):
+  "Register map of a PCA9685: MODE1/MODE2, PRESCALE, LED and ALL_LED registers"
+
+  MODE1, MODE2, ALLCALLADR, LED0_ON_L = 0x00, 0x01, 0x05, 0x06
+  ALL_LED_ON_L, ALL_LED_OFF_H, PRESCALE = 0xFA, 0xFD, 0xFE
+  RESTART, AI, SLEEP, ALLCALL = 0x80, 0x20, 0x10, 0x01
+  FULL = 0x10                         # bit 4 of LEDn_ON_H / LEDn_OFF_H
+
+  def __init__(self):
+    self.reset()
+
+  def reset(self):
+    "Power-on register values, also the state after a software reset"
+    self.registers = [0] * 256
+    self.registers[self.MODE1] = self.SLEEP | self.ALLCALL
+    self.registers[self.MODE2] = 0x04
+    self.registers[0x02:0x06] = [0xE2, 0xE4, 0xE8, 0xE0]
+    for reg in range(self.LED0_ON_L + 3, self.LED0_ON_L + 64, 4) + [self.ALL_LED_OFF_H]:
+      self.registers[reg] = self.FULL
+    self.registers[self.PRESCALE] = 0x1E
+    self.pointer = 0
+
+  def autoIncrement(self):
+    return self.registers[self.MODE1] & self.AI
+
+  def answersAllCall(self, address):
+    return self.registers[self.MODE1] & self.ALLCALL and self.registers[self.ALLCALLADR] >> 1 == address
+
+  def write(self, reg, data):
+    "Writes bytes starting at reg, following the auto-increment bit"
+    for value in data:
+      self.store(reg, value & 0xFF)
+      if self.autoIncrement():
+        reg = (reg + 1) & 0xFF
+    self.pointer = reg
+
+  def store(self, reg, value):
+    if reg == self.MODE1:
+      value &= ~self.RESTART          # writing RESTART clears it
+    elif reg == self.PRESCALE and not self.registers[self.MODE1] & self.SLEEP:
+      return                          # PRESCALE is only writable while asleep
+    elif self.ALL_LED_ON_L <= reg <= self.ALL_LED_OFF_H:
+      offset = reg - self.ALL_LED_ON_L
+      for channel in range(16):
+        self.registers[self.LED0_ON_L + 4*channel + offset] = value
+      return                          # ALL_LED registers read back as zero
+    self.registers[reg] = value
+
+  def read(self, reg, length):
+    "Reads bytes starting at reg, following the auto-increment bit"
+    data = []
+    for i in range(length):
+      data.append(self.registers[reg])
+      if self.autoIncrement():
+        reg = (reg + 1) & 0xFF
+    self.pointer = reg
+    return data
+
+  def pulse(self, channel):
+    "Returns the (on, off) counts of a channel, None when it is fully off"
+    on_l, on_h, off_l, off_h = self.registers[self.LED0_ON_L + 4*channel:self.LED0_ON_L + 4*channel + 4]
+    if off_h & self.FULL or self.registers[self.MODE1] & self.SLEEP:
+      return None
+    if on_h & self.FULL:
+      return (0, 4096)
+    return (on_l | (on_h & 0x0F) << 8, off_l | (off_h & 0x0F) << 8)
+
+  def frequency(self, oscillator=25000000.0):
+    return oscillator / (4096 * (self.registers[self.PRESCALE] + 1))
+
+
+def simulatedBus(busnum):
+  "Bus factory returning the SimulatedBus installed for busnum"
+  buses = SimulatedBus.installed
+  if busnum not in buses and None not in buses:
+    raise IOError(errno.ENOENT, 'No simulated bus %d' % busnum)
+  return buses.get(busnum, buses.get(None))
+
+
+class SimulatedBus(object):
+  "Stand-in for smbus.SMBus holding simulated PCA9685s, timing and recording every transaction"
+
+  GENERAL_CALL, SWRST = 0x00, 0x06
+
+  installed = {}                  # bus number : bus, None for every other number
+
+  def __init__(self, addresses=(0x40, 0x41), timing=None, clock=None):
+    self.devices = dict((address, SimulatedPCA9685()) for address in addresses)
+    self.timing = timing or BusTiming()
+    self.clock = clock                # a VirtualClock advanced by the time of every transaction
+    self.clear()
+
+  def clear(self):
+    "Forgets the recorded transactions and the accumulated bus time"
+    self.transactions = []
+    self.elapsed = 0.0
+
+  def install(self, busnum=None):
+    "Makes Adafruit_I2C instances created afterwards on busnum, or on any bus, use this bus"
+    if busnum is None:
+      SimulatedBus.installed.clear()
+    SimulatedBus.installed[busnum] = self
+    Adafruit_I2C.setBusFactory(simulatedBus)
+    return self
+
+  @property
+  def blockLimit(self):
+    return self.timing.blockLimit
+
+  def bytesWritten(self):
+    return sum(len(t.data) for t in self.transactions)
+
+  def __record(self, kind, address, reg, data, nbytes, restarts=0, overhead=True):
+    seconds = self.timing.cost(nbytes, restarts)
+    if not overhead:
+      seconds -= self.timing.overhead   # a later message of the same ioctl
+    self.transactions.append(Transaction(kind, address, reg, tuple(data), seconds))
+    self.elapsed += seconds
+    if self.clock is not None:
+      self.clock.advance(seconds)
+
+  def __targets(self, address, kind, reg, data, nbytes, overhead=True):
+    if address in self.devices:
+      targets = [self.devices[address]]
+    else:
+      targets = [d for d in self.devices.itervalues() if d.answersAllCall(address)]
+    if not targets:
+      self.__record(kind, address, reg, (), 1, overhead=overhead)   # address byte not acknowledged
+      raise IOError(errno.EREMOTEIO, 'Remote I/O error')
+    self.__record(kind, address, reg, data, nbytes, overhead=overhead)
+    return targets
+
+  def __device(self, address, kind, reg, nbytes, overhead=True):
+    if address not in self.devices:
+      self.__record(kind, address, reg, (), 1, overhead=overhead)
+      raise IOError(errno.EREMOTEIO, 'Remote I/O error')
+    self.__record(kind, address, reg, (), nbytes, restarts=1, overhead=overhead)
+    return self.devices[address]
+
+  def ioctl(self, fd, request, arg):
+    "Serves the I2C_RDWR ioctls of an I2CDevBus, so it can run on a fake device file"
+    if request != I2C_RDWR:
+      raise IOError(errno.EINVAL, 'Invalid argument')
+    for i in range(arg.nmsgs):
+      message, first = arg.msgs[i], i == 0
+      if message.flags & I2C_M_RD:
+        device = self.__device(message.addr, 'i2c_rdwr', None, 1 + message.len, overhead=first)
+        for k, value in enumerate(device.read(device.pointer, message.len)):
+          message.buf[k] = value
+        continue
+      data = message.buf[:message.len]
+      if message.addr == self.GENERAL_CALL and data == [self.SWRST]:
+        self.__record('i2c_rdwr', message.addr, None, data, 2, overhead=first)
+        for device in self.devices.itervalues():
+          device.reset()
+        continue
+      reg = data[0] if data else None
+      for device in self.__targets(message.addr, 'i2c_rdwr', reg, data[1:], 1 + len(data), overhead=first):
+        if data:
+          device.write(reg, data[1:])
+
+  def write_byte(self, address, value):
+    if address == self.GENERAL_CALL and value == self.SWRST:
+      self.__record('write_byte', address, None, [value], 2)
+      for device in self.devices.itervalues():
+        device.reset()
+      return
+    for device in self.__targets(address, 'write_byte', None, [value], 2):
+      device.pointer = value
+
+  def write_byte_data(self, address, reg, value):
+    for device in self.__targets(address, 'write_byte_data', reg, [value], 3):
+      device.write(reg, [value])
+
+  def write_word_data(self, address, reg, value):
+    data = [value & 0xFF, (value >> 8) & 0xFF]
+    for device in self.__targets(address, 'write_word_data', reg, data, 4):
+      device.write(reg, data)
+
+  def write_i2c_block_data(self, address, reg, data):
+    if len(data) > self.timing.blockLimit:
+      raise OverflowError('block of %d bytes exceeds the %d byte limit' % (len(data), self.timing.blockLimit))
+    for device in self.__targets(address, 'write_i2c_block_data', reg, data, 2 + len(data)):
+      device.write(reg, data)
+
+  def read_byte(self, address):
+    device = self.__device(address, 'read_byte', None, 2)
+    return device.read(device.pointer, 1)[0]
+
+  def read_byte_data(self, address, reg):
+    return self.__device(address, 'read_byte_data', reg, 4).read(reg, 1)[0]
+
+  def read_word_data(self, address, reg):
+    low, high = self.__device(address, 'read_word_data', reg, 5).read(reg, 2)
+    return low | high << 8
+
+  def read_i2c_block_data(self, address, reg, length=32):
+    if length > self.timing.blockLimit:
+      raise OverflowError('block of %d bytes exceeds the %d byte limit' % (length, self.timing.blockLimit))
+    return self.__device(address, 'read_i2c_block_data', reg, 3 + length).read(reg, length)
@@ -0,0 +1,275 @@
+#!/usr/bin/python
+
+import json
+import threading
+from clock import now
+from collections import deque
+from i2c import Adafruit_I2C
+
+# ============================================================================
+# Counters, latency histograms and spans of bus and motion activity, exported
+# as a metrics snapshot or as a Chrome / Perfetto trace
+# ============================================================================
+
+active = None           # the installed Tracer, instrumented call sites do nothing while None
+
+class NullSpan(object):
+  "Stands in for a Span while no tracer is installed"
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    return False
+
+nullSpan = NullSpan()
+
+def span(name, category='routine'):
+  "A span of the active tracer, or a no-op while none is installed"
+  return active.span(name, category) if active is not None else nullSpan
+
+
+class Histogram(object):
+  "Latencies counted in power of two buckets of microseconds"
+
+  def __init__(self):
+    self.buckets = {}             # bucket b counts latencies below 2**b microseconds
+    self.count = 0
+    self.total = 0.0
+    self.max = 0.0
+
+  def add(self, seconds):
+    bucket = int(seconds * 1e6).bit_length()
+    self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+    self.count += 1
+    self.total += seconds
+    self.max = max(self.max, seconds)
+
+  def percentile(self, p):
+    "Upper bound in seconds of the bucket holding the p-th percentile"
+    rank, seen = p / 100.0 * self.count, 0
+    for bucket in sorted(self.buckets):
+      seen += self.buckets[bucket]
+      if seen >= rank:
+        return (1 << bucket) / 1e6
+    return 0.0
+
+  def snapshot(self):
+    return {'count': self.count, 'total': self.total, 'mean': self.total / (self.count or 1),
+            'max': self.max, 'p50': self.percentile(50), 'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'buckets': dict(('<%dus' % (1 << b), n) for b, n in self.buckets.iteritems())}
+
+
+class Span(object):
+  "Times the block it guards, see Tracer.span"
+
+  __slots__ = ('tracer', 'name', 'category', 'start')
+
+  def __init__(self, tracer, name, category):
+    self.tracer, self.name, self.category = tracer, name, category
+
+  def __enter__(self):
+    self.start = self.tracer.clock()
+    return self
+
+  def __exit__(self, *exc):
+    self.tracer.complete(self.name, self.category, self.start, self.tracer.clock())
+    return False
+
+
+class InstrumentedBus(object):
+  "Wraps an smbus.SMBus compatible bus, reporting every transaction to a Tracer"
+
+  def __init__(self, bus, busnum, tracer):
+    self.bus = bus
+    self.busnum = busnum
+    self.tracer = tracer
+    if hasattr(bus, 'writeBlocks'):
+      self.writeBlocks = self.__writeBlocks
+
+  def __getattr__(self, name):
+    if name == 'bus':
+      raise AttributeError(name)
+    return getattr(self.bus, name)
+
+  def __call(self, kind, address, reg, nbytes, call, *args):
+    start, failed = self.tracer.clock(), True
+    try:
+      result = call(*args)
+      failed = False
+      return result
+    finally:
+      self.tracer.transaction(self.busnum, kind, address, reg, nbytes, start, self.tracer.clock(), failed)
+
+  def __writeBlocks(self, blocks):
+    start, failed = self.tracer.clock(), True
+    try:
+      self.bus.writeBlocks(blocks)
+      failed = False
+    finally:
+      end = self.tracer.clock()
+      for address, reg, data in blocks:
+        self.tracer.transaction(self.busnum, 'writeBlocks', address, reg, len(data), start, end, failed)
+        start = end       # the ioctl is timed once, as its first block
+
+  def write_byte(self, address, value):
+    return self.__call('write_byte', address, None, 1, self.bus.write_byte, address, value)
+
+  def write_byte_data(self, address, reg, value):
+    return self.__call('write_byte_data', address, reg, 1, self.bus.write_byte_data, address, reg, value)
+
+  def write_word_data(self, address, reg, value):
+    return self.__call('write_word_data', address, reg, 2, self.bus.write_word_data, address, reg, value)
+
+  def write_i2c_block_data(self, address, reg, data):
+    return self.__call('write_i2c_block_data', address, reg, len(data),
+                       self.bus.write_i2c_block_data, address, reg, data)
+
+  def read_byte(self, address):
+    return self.__call('read_byte', address, None, 1, self.bus.read_byte, address)
+
+  def read_byte_data(self, address, reg):
+    return self.__call('read_byte_data', address, reg, 1, self.bus.read_byte_data, address, reg)
+
+  def read_word_data(self, address, reg):
+    return self.__call('read_word_data', address, reg, 2, self.bus.read_word_data, address, reg)
+
+  def read_i2c_block_data(self, address, reg, length=32):
+    return self.__call('read_i2c_block_data', address, reg, length,
+                       self.bus.read_i2c_block_data, address, reg, length)
+
+
+class Tracer(object):
+  "Collects bus transactions, sleeps and routine spans while installed"
+
+  # Only buses opened after install() are instrumented, so install the tracer (after
+  # any SimulatedBus) before the robot and its drivers are created. At most capacity
+  # events are kept for the trace, the counters and histograms cover everything.
+  # Timestamps come from the current clock, see hexy.comm.clock.
+
+  def __init__(self, clock=now, capacity=100000):
+    self.clock = clock
+    self.capacity = capacity
+    self.lock = threading.Lock()
+    self.factory = None
+    self.buses = {}
+    self.reset()
+
+  def reset(self):
+    "Forgets everything collected so far and restarts the trace timeline"
+    with self.lock:
+      self.origin = self.clock()
+      self.events = deque(maxlen=self.capacity)
+      self.threads = {}           # thread ident : name, for the trace metadata
+      self.counters = {}          # (busnum, address, register) : [transactions, bytes, errors]
+      self.latencies = {}         # bus operation : Histogram
+      self.spans = {}             # span name : Histogram
+      self.totals = {'bus': 0.0, 'sleep': 0.0, 'errors': 0}
+
+  def install(self):
+    "Instruments the buses opened from now on and makes this the active tracer"
+    global active
+    self.factory = factory = Adafruit_I2C.busFactory
+    def instrumented(busnum):
+      if busnum not in self.buses:
+        self.buses[busnum] = InstrumentedBus(factory(busnum), busnum, self)
+      return self.buses[busnum]
+    Adafruit_I2C.setBusFactory(instrumented)
+    active = self
+    return self
+
+  def uninstall(self):
+    "Restores the bus factory found by install, already opened buses stay instrumented"
+    global active
+    Adafruit_I2C.setBusFactory(self.factory)
+    self.buses = {}
+    if active is self:
+      active = None
+
+  def instrument(self, obj, names):
+    "Makes each call of obj.<name> a span, through wrappers set on the instance"
+    for name in names:
+      setattr(obj, name, self.__traced(name, getattr(obj, name)))
+
+  def __traced(self, name, method):
+    def traced(*args, **kwargs):
+      if active is not self:
+        return method(*args, **kwargs)
+      with Span(self, name, 'routine'):
+        return method(*args, **kwargs)
+    traced.__name__ = name
+    return traced
+
+  def span(self, name, category='routine'):
+    "with tracer.span('walk'): ... records the block as one span"
+    return Span(self, name, category)
+
+  def __event(self, name, category, start, end, args=None):
+    thread = threading.current_thread()
+    self.threads.setdefault(thread.ident, thread.name)
+    self.events.append((name, category, start, end, thread.ident, args))
+
+  def complete(self, name, category, start, end):
+    "Records a finished span, sleeps are also added to the sleep total"
+    with self.lock:
+      self.spans.setdefault(name, Histogram()).add(end - start)
+      if category == 'sleep':
+        self.totals['sleep'] += end - start
+      self.__event(name, category, start, end)
+
+  def transaction(self, busnum, kind, address, reg, nbytes, start, end, failed=False):
+    "Records one bus transaction"
+    with self.lock:
+      counter = self.counters.get((busnum, address, reg))
+      if counter is None:
+        counter = self.counters[(busnum, address, reg)] = [0, 0, 0]
+      counter[0] += 1
+      counter[1] += nbytes
+      counter[2] += failed
+      latency = self.latencies.get(kind)
+      if latency is None:
+        latency = self.latencies[kind] = Histogram()
+      latency.add(end - start)
+      self.totals['bus'] += end - start
+      self.totals['errors'] += failed
+      self.__event('%s 0x%02X' % (kind, address), 'bus', start, end,
+                   {'bus': busnum, 'register': reg, 'bytes': nbytes, 'error': failed})
+
+  def failure(self, address, counted=False):
+    "Records an error Adafruit_I2C reported, added to the error total unless its instrumented bus counted it"
+    now = self.clock()
+    with self.lock:
+      if not counted:
+        self.totals['errors'] += 1
+      self.__event('error 0x%02X' % address, 'error', now, now)
+
+  def snapshot(self):
+    "Counters per bus, chip and register, latency histograms and totals as a JSON friendly dict"
+    with self.lock:
+      transactions = {}
+      for (busnum, address, reg), (count, nbytes, errors) in self.counters.iteritems():
+        key = '%d:0x%02X:%s' % (busnum, address, '-' if reg is None else '0x%02X' % reg)
+        transactions[key] = {'transactions': count, 'bytes': nbytes, 'errors': errors}
+      return {'elapsed': self.clock() - self.origin, 'totals': dict(self.totals),
+              'transactions': transactions,
+              'latencies': dict((k, h.snapshot()) for k, h in self.latencies.iteritems()),
+              'spans': dict((k, h.snapshot()) for k, h in self.spans.iteritems())}
+
+  def chromeTrace(self):
+    "The collected events in the Chrome trace event format, also read by Perfetto"
+    with self.lock:
+      events = [{'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': name}}
+                for tid, name in self.threads.iteritems()]
+      for name, category, start, end, tid, args in self.events:
+        event = {'name': name, 'cat': category, 'ph': 'X', 'pid': 1, 'tid': tid,
+                 'ts': (start - self.origin) * 1e6, 'dur': (end - start) * 1e6}
+        if args:
+          event['args'] = args
+        events.append(event)
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+  def saveChromeTrace(self, path):
+    "Writes chromeTrace() to path, open it in chrome://tracing or ui.perfetto.dev"
+    with open(path, 'w') as f:
+      json.dump(self.chromeTrace(), f)
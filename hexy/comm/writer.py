@@ -0,0 +1,162 @@
+#!/usr/bin/python
+
+import Queue
+import threading
+import time
+
+# ============================================================================
+# Background writer owning the servo drivers, latest value wins per channel
+# ============================================================================
+
+class BusWriter(object):
+  "Owns drivers on a dedicated thread, fed {channel: pulse} batches from any thread"
+
+  # drivers is anything with write({channel: pulse}), e.g. hexy.robot.core.Drivers.
+  # Batches waiting in the queue are merged before each flush, so a channel updated
+  # several times only goes out once, with its newest pulse. write() blocks while
+  # maxsize batches are waiting. Other attributes are looked up on drivers, so a
+  # BusWriter can be passed to HexapodCore in place of its drivers.
+
+  def __init__(self, drivers, maxsize=8):
+    self.drivers = drivers
+    self.queue = Queue.Queue(maxsize)
+    self.lock = threading.Lock()
+    self.batches = 0          # batches queued
+    self.targets = 0          # channel targets queued
+    self.coalesced = 0        # targets replaced by a newer one before being written
+    self.flushes = 0          # calls to drivers.write
+    self.blocked = 0          # writes that waited for room in the queue
+    self.blockedTime = 0.0
+    self.maxDepth = 0
+    self.errors = 0
+    self.lastError = None
+    self.thread = threading.Thread(target=self.__loop, name='hexy bus writer')
+    self.thread.daemon = True
+    self.thread.start()
+
+  def __getattr__(self, name):
+    if name == 'drivers':
+      raise AttributeError(name)
+    return getattr(self.drivers, name)
+
+  def write(self, pulses):
+    "Queues a {channel: pulse} batch, waits while the queue is full"
+    batch = dict(pulses)
+    try:
+      self.queue.put_nowait(batch)
+    except Queue.Full:
+      start = time.time()
+      self.queue.put(batch)
+      with self.lock:
+        self.blocked += 1
+        self.blockedTime += time.time() - start
+    with self.lock:
+      self.batches += 1
+      self.targets += len(batch)
+      self.maxDepth = max(self.maxDepth, self.queue.qsize())
+
+  def put(self, channel, pulse):
+    "Queues a single channel target"
+    self.write({channel: pulse})
+
+  def flush(self, timeout=None):
+    "Waits until everything queued before this call has been written, returns False on timeout"
+    barrier = threading.Event()
+    self.queue.put(barrier)
+    return barrier.wait(timeout)
+
+  def close(self):
+    "Writes what is queued and stops the thread"
+    self.queue.put(None)
+    self.thread.join()
+
+  def metrics(self):
+    "Counters of the queue and the writer thread"
+    with self.lock:
+      return {'batches': self.batches, 'targets': self.targets, 'coalesced': self.coalesced,
+              'flushes': self.flushes, 'blocked': self.blocked, 'blockedTime': self.blockedTime,
+              'maxDepth': self.maxDepth, 'depth': self.queue.qsize(), 'errors': self.errors}
+
+  def __send(self, pulses):
+    if not pulses:
+      return
+    try:
+      self.drivers.write(pulses)
+    except Exception, error:
+      with self.lock:
+        self.errors += 1
+      self.lastError = error
+    with self.lock:
+      self.flushes += 1
+
+  def __loop(self):
+    while True:
+      item, pending, coalesced = self.queue.get(), {}, 0
+      while True:
+        if item is None:
+          self.__send(pending)
+          return
+        if isinstance(item, dict):
+          coalesced += len(pending) + len(item)
+          pending.update(item)
+          coalesced -= len(pending)
+        else:
+          self.__send(pending)      # a barrier: write what came before it, then release
+          pending = {}
+          item.set()
+        try:
+          item = self.queue.get_nowait()
+        except Queue.Empty:
+          break
+      with self.lock:
+        self.coalesced += coalesced
+      self.__send(pending)
+
+
+class BusWorker(object):
+  "A thread that runs the calls submitted for one bus, so several buses can be written at once"
+
+  def __init__(self, name='hexy bus worker'):
+    self.queue = Queue.Queue()
+    self.thread = threading.Thread(target=self.__loop, name=name)
+    self.thread.daemon = True
+    self.thread.start()
+
+  def submit(self, call, *args):
+    "Queues call(*args), returns a Job to wait on"
+    job = Job(call, args)
+    self.queue.put(job)
+    return job
+
+  def close(self):
+    self.queue.put(None)
+    self.thread.join()
+
+  def __loop(self):
+    while True:
+      job = self.queue.get()
+      if job is None:
+        return
+      job.run()
+
+
+class Job(object):
+  "A call submitted to a BusWorker"
+
+  def __init__(self, call, args):
+    self.call, self.args = call, args
+    self.error = None
+    self.event = threading.Event()
+
+  def run(self):
+    try:
+      self.call(*self.args)
+    except Exception, error:
+      self.error = error
+    self.event.set()
+
+  def wait(self):
+    "Blocks until the call returned and raises what it raised"
+    self.event.wait()
+    if self.error is not None:
+      raise self.error
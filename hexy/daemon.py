@@ -0,0 +1,293 @@
+""" A long running process owning the servo drivers and one DancingHexapod, taking
+    jobs over a Unix domain socket, so starting a routine costs a message instead of
+    an interpreter start and a hardware bring-up.
+
+    sudo python -m hexy.daemon serve --group hexy &
+    python -m hexy.daemon run walk repetitions=10 --priority 1
+    python -m hexy.daemon queue boot_up thriller shut_down
+    python -m hexy.daemon status
+    python -m hexy.daemon cancel 3
+
+    every request and reply is a JSON object on one line:
+
+    {"op": "run", "steps": [["walk", {"repetitions": 10}]], "priority": 1, "preempt": false}
+    {"op": "status"}, {"op": "status", "job": 3}, {"op": "wait", "job": 3, "timeout": 5}
+    {"op": "cancel"}, {"op": "cancel", "job": 3}, {"op": "routines"}, {"op": "stop"}, {"op": "release"}
+
+    stop cuts every servo and cancels every job without planting the feet, jobs fail
+    with Stopped until a release
+
+    replies carry "ok": true or "ok": false with an "error"
+
+    the socket is made read-write for its owner and group (--mode, 0660 by default),
+    so clients in --group run without sudo. serve refuses a socket a daemon answers on """
+
+import argparse
+import errno
+import grp
+import json
+import os
+import socket
+import SocketServer
+import sys
+import threading
+from collections import OrderedDict
+
+PATH = '/tmp/hexy.sock'
+
+
+class Daemon:
+    """ the jobs of one robot, run through a Motion. finished jobs are kept for status
+        queries, the latest history of them """
+
+    def __init__(self, robot, history = 100):
+
+        from .robot.core import routines
+        from .robot.tasks import Motion
+
+        self.robot, self.history = robot, history
+        self.motion = Motion(robot)
+        self.routines = routines(robot)
+
+        self.jobs = OrderedDict() # job id : MotionTask
+        self.next_id = 1
+        self.lock = threading.Lock()
+
+    def run(self, steps, priority = 0, preempt = False, name = None):
+        """ queues the [name, kwargs] steps as one job, returns its id """
+
+        calls = []
+
+        for step in steps:
+            routine, kwargs = (step, {}) if isinstance(step, basestring) else step
+            if routine not in self.routines: raise ValueError('no routine ' + routine)
+            calls.append((str(routine), (), dict((str(k), v) for k, v in kwargs.iteritems())))
+
+        if not calls: raise ValueError('no steps')
+
+        with self.lock:
+            job, self.next_id = self.next_id, self.next_id + 1
+            self.jobs[job] = self.motion.submit(calls, priority, name, preempt)
+            self.forget()
+
+        return job
+
+    def forget(self):
+
+        done = [job for job, task in self.jobs.iteritems() if task.done()]
+
+        for job in done[:max(len(done) - self.history, 0)]:
+            del self.jobs[job]
+
+    def task(self, job):
+
+        with self.lock:
+            if job not in self.jobs: raise ValueError('no job %s' % job)
+            return self.jobs[job]
+
+    def cancel(self, job = None):
+        """ cancels one job, or the running one and everything queued """
+
+        if job is None: self.motion.cancel()
+        else: self.task(job).cancel()
+
+    def describe(self, job, task):
+
+        status = {'job': job, 'name': task.name, 'state': task.state(), 'priority': task.priority,
+                  'step': task.step, 'steps': len(task.steps)}
+
+        if task.error is not None: status['error'] = repr(task.error)
+        return status
+
+    def status(self, job = None):
+        """ one job, or the robot: the running and queued jobs, the recent ones and pacing """
+
+        if job is not None: return self.describe(job, self.task(job))
+
+        with self.lock:
+            jobs = [self.describe(job, task) for job, task in self.jobs.iteritems()]
+
+        return {'jobs': jobs, 'scheduler': self.robot.scheduler.stats(),
+                'angles': dict((joint.name, joint.angle) for leg in self.robot.legs
+                               for joint in leg.joints)}
+
+    def handle(self, request):
+        """ the reply to one request """
+
+        try:
+            op = request.get('op')
+
+            if op == 'run':
+                job = self.run(request['steps'], request.get('priority', 0),
+                               request.get('preempt', False), request.get('name'))
+                return {'ok': True, 'job': job}
+
+            if op == 'cancel':
+                self.cancel(request.get('job'))
+                return {'ok': True}
+
+            if op == 'status':
+                return {'ok': True, 'status': self.status(request.get('job'))}
+
+            if op == 'wait':
+                done = self.task(request['job']).wait(request.get('timeout'))
+                return {'ok': True, 'done': done, 'status': self.status(request['job'])}
+
+            if op == 'routines':
+                return {'ok': True, 'routines': self.routines}
+
+            if op == 'stop':
+                self.robot.emergency_stop()
+                self.motion.cancel(stance = False)
+                return {'ok': True}
+
+            if op == 'release':
+                self.robot.release()
+                return {'ok': True}
+
+            raise ValueError('unknown op %r' % op)
+
+        except Exception, error:
+            return {'ok': False, 'error': str(error)}
+
+
+class Handler(SocketServer.StreamRequestHandler):
+
+    def handle(self):
+
+        for line in iter(self.rfile.readline, ''):
+            try:
+                reply = self.server.daemon.handle(json.loads(line))
+            except ValueError, error:
+                reply = {'ok': False, 'error': 'bad request: %s' % error}
+
+            self.wfile.write(json.dumps(reply) + '\n')
+            self.wfile.flush()
+
+
+class Server(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+
+    daemon_threads = True
+
+    def __init__(self, daemon, path = PATH, mode = 0660, group = None):
+        """ serves daemon on path, a socket left by a daemon that is gone is replaced,
+            one that answers raises IOError """
+
+        if os.path.exists(path):
+            if answers(path): raise IOError(errno.EADDRINUSE, 'a daemon is serving ' + path)
+            os.remove(path)
+
+        SocketServer.UnixStreamServer.__init__(self, path, Handler)
+        self.daemon, self.path = daemon, path
+
+        try:
+            if group is not None: os.chown(path, -1, grp.getgrnam(group).gr_gid)
+            os.chmod(path, mode)
+        except:
+            self.server_close()
+            raise
+
+    def server_close(self):
+
+        SocketServer.UnixStreamServer.server_close(self)
+        if os.path.exists(self.path): os.remove(self.path)
+
+
+def request(message, path = PATH):
+    """ sends one request to a running daemon and returns its reply """
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        client.connect(path)
+        client.sendall(json.dumps(message) + '\n')
+        return json.loads(client.makefile().readline())
+    finally:
+        client.close()
+
+
+def answers(path):
+    """ whether something accepts connections on the socket at path """
+
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        probe.connect(path)
+        return True
+    except socket.error:
+        return False
+    finally:
+        probe.close()
+
+
+def value(text):
+    """ a command line argument value, JSON where it parses """
+
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def serve(path = PATH, warm = True, mode = 0660, group = None):
+    """ brings the robot up once and serves until interrupted. with warm drivers a
+        restarted daemon keeps the pose the previous one left """
+
+    from .robot.core import Drivers
+    from .robot.dancing import DancingHexapod
+
+    drivers = Drivers(warm = warm)
+    drivers.arm()
+
+    server = Server(Daemon(DancingHexapod(drivers = drivers)), path, mode, group)
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def main(argv = None):
+
+    parser = argparse.ArgumentParser(description = 'hexy motion daemon and its client')
+    parser.add_argument('command', choices = ['serve', 'run', 'queue', 'status', 'cancel', 'wait', 'routines', 'stop',
+                                                         'release'])
+    parser.add_argument('arguments', nargs = '*', help = 'routine and key=value arguments, routines, or a job')
+    parser.add_argument('--socket', default = PATH)
+    parser.add_argument('--priority', type = int, default = 0)
+    parser.add_argument('--preempt', action = 'store_true', help = 'cancel a running job of lower priority')
+    parser.add_argument('--cold', action = 'store_true', help = 'reset the chips instead of keeping their outputs')
+    parser.add_argument('--mode', type = lambda text: int(text, 8), default = 0660,
+                        help = 'permissions of the socket, octal')
+    parser.add_argument('--group', help = 'group owning the socket, whose members may send requests')
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        serve(args.socket, not args.cold, args.mode, args.group)
+        return 0
+
+    if args.command in ('run', 'queue') and not args.arguments:
+        parser.error(args.command + ' needs a routine')
+
+    if args.command == 'run':
+        routine, pairs = args.arguments[0], [a.split('=', 1) for a in args.arguments[1:]]
+        message = {'op': 'run', 'steps': [[routine, dict((k, value(v)) for k, v in pairs)]]}
+    elif args.command == 'queue':
+        message = {'op': 'run', 'steps': [[routine, {}] for routine in args.arguments]}
+    elif args.command in ('status', 'cancel', 'wait'):
+        message = {'op': args.command}
+        if args.arguments: message['job'] = int(args.arguments[0])
+    else:
+        message = {'op': args.command}
+
+    if message['op'] == 'run':
+        message.update(priority = args.priority, preempt = args.preempt)
+
+    reply = request(message, args.socket)
+    print json.dumps(reply, indent = 2, sort_keys = True)
+
+    return 0 if reply.get('ok') else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
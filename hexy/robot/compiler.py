@@ -0,0 +1,292 @@
+from array import array
+import hashlib
+import math
+import os
+import struct
+from collections import OrderedDict
+from recording import HEADER, CALIBRATION, frame_struct
+
+""" compiled routine file layout, little endian, the structs of a motion file:
+
+    header      - magic 'HXGC', version (uint16), channels n (uint16), PWM frequency (float64)
+    calibration - n x (min pulse, max pulse, max angle, leeway) as (uint16, uint16, int16, int16)
+    ending      - the lead in seconds and the angles the routine leaves (n x float64, NaN
+                  for a joint that is off), then their pulses (n x uint16)
+    frames      - seconds paused after the frame (float64), then n x pulse (uint16),
+                  UNSENT for a channel the frame doesn't write """
+
+MAGIC, VERSION = 'HXGC', 1
+
+UNSENT = 0xFFFF # above any 12 bit pulse
+
+
+def ending_struct(channels):
+    return struct.Struct('<d%dd%dH' % (channels, channels))
+
+
+class Compiled(object):
+    """ a routine reduced to the pulses it sends and the pauses between them
+
+        lead   - seconds paused before the first frame
+        frames - the pulses of every channel, UNSENT where a frame leaves it alone, a
+                 row of channels values per frame in the order they were sent
+        delays - the seconds paused after each frame
+        angles, pulses - the joint state the routine leaves behind """
+
+    __slots__ = ('channels', 'lead', 'frames', 'delays', 'angles', 'pulses')
+
+    def __init__(self, channels, lead, frames, delays, angles, pulses):
+
+        self.channels, self.lead = channels, lead
+        self.frames, self.delays = frames, delays
+        self.angles, self.pulses = angles, pulses
+
+    def sent(self):
+        """ yields the channel : pulse dict written by each frame and the seconds paused
+            after it """
+
+        n, frames = self.channels, self.frames
+
+        for i, delay in enumerate(self.delays):
+            row = frames[i * n:(i + 1) * n]
+            yield dict((ch, pulse) for ch, pulse in enumerate(row) if pulse != UNSENT), delay
+
+
+def frozen(value):
+    """ a hashable stand-in for a routine argument, lists as tuples and dicts and sets
+        as sorted tuples, raises TypeError for anything else that isn't hashable """
+
+    if isinstance(value, (list, tuple)):
+        return tuple(frozen(item) for item in value)
+
+    if isinstance(value, dict):
+        return ('dict',) + tuple(sorted((frozen(k), frozen(v)) for k, v in value.iteritems()))
+
+    if isinstance(value, (set, frozenset)):
+        return ('set',) + tuple(sorted(frozen(item) for item in value))
+
+    hash(value)
+    return value
+
+
+class Recorder:
+    """ stands in for the output and the scheduler of a JointState while a routine
+        is compiled, nothing is sent and nothing waits """
+
+    def __init__(self, channels):
+
+        self.lead, self.frames, self.delays = 0.0, array('H'), array('d')
+        self.unsent = array('H', [UNSENT] * channels)
+
+    def output(self, pulses):
+
+        start = len(self.frames)
+        self.frames.extend(self.unsent)
+
+        for ch, pulse in pulses.iteritems():
+            self.frames[start + ch] = pulse
+
+        self.delays.append(0.0)
+
+    def mark(self):
+        pass
+
+    def pause(self, t):
+
+        if t <= 0: return
+
+        if self.delays:
+            self.delays[-1] += t
+        else:
+            self.lead += t
+
+
+class GaitCompiler:
+    """ runs a routine of robot once against a Recorder and replays the recorded frames
+        on later calls. results are kept in an LRU of up to size entries and, when
+        directory is given, written there as compiled routine files. a file that can't
+        be read or written only costs a recompile. the key covers the routine, its arguments,
+        the starting joint angles and the calibration, so any change recompiles.
+
+        compiler = GaitCompiler(hexy, directory = '/home/pi/.hexy')
+        compiler.run('walk', swing = 25, repetitions = 10) """
+
+    def __init__(self, robot, size = 32, directory = None):
+
+        self.robot, self.size, self.directory = robot, size, directory
+        self.cache = OrderedDict()
+        self.hits, self.misses, self.loads = 0, 0, 0
+        self.uncompiled = 0
+
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def calibration(self):
+        """ digest of the pulse ranges and angle limits every table is built from, and of
+            the speed limits and servo frame rate trajectories are planned with """
+
+        state = self.robot.state
+        limits = (state.min_pulses, state.max_pulses, state.maxes, state.leeways, state.speeds)
+        rate = getattr(self.robot.drivers, 'freq', None)
+
+        return hashlib.sha1(repr(([list(a) for a in limits], rate))).hexdigest()
+
+    def key(self, name, args, kwargs):
+
+        return (self.robot.__class__.__name__, name, frozen(args), frozen(kwargs),
+                tuple(self.robot.state.angles), self.calibration())
+
+    def run(self, name, *args, **kwargs):
+        """ same as getattr(robot, name)(*args, **kwargs), compiled on first use. a
+            routine given an argument that can't be part of a key runs uncompiled """
+
+        try:
+            self.key(name, args, kwargs)
+        except TypeError:
+            self.uncompiled += 1
+            getattr(self.robot, name)(*args, **kwargs)
+            return
+
+        self.replay(self.compile(name, *args, **kwargs))
+
+    def compile(self, name, *args, **kwargs):
+
+        key = self.key(name, args, kwargs)
+
+        if key in self.cache:
+            self.hits += 1
+            compiled = self.cache.pop(key)
+        else:
+            compiled = self.load(key)
+
+            if compiled is None:
+                self.misses += 1
+                compiled = self.record(name, args, kwargs)
+                self.save(key, compiled)
+
+        self.cache[key] = compiled
+
+        while len(self.cache) > self.size:
+            self.cache.popitem(last = False)
+
+        return compiled
+
+    def record(self, name, args, kwargs):
+
+        state = self.robot.state
+        angles, pulses = list(state.angles), state.pulses[:]
+        output, scheduler = state.output, state.scheduler
+
+        recorder = Recorder(len(pulses))
+        state.output, state.scheduler = recorder.output, recorder
+
+        try:
+            getattr(self.robot, name)(*args, **kwargs)
+            compiled = Compiled(len(pulses), recorder.lead, recorder.frames, recorder.delays,
+                                list(state.angles), state.pulses[:])
+        finally:
+            state.output, state.scheduler = output, scheduler
+            state.angles[:], state.pulses[:] = angles, pulses
+
+        return compiled
+
+    def replay(self, compiled):
+
+        state = self.robot.state
+        send, pause = state.send, state.scheduler.pause
+
+        pause(compiled.lead)
+
+        for pulses, delay in compiled.sent():
+            send(pulses)
+            pause(delay)
+
+        state.angles[:] = compiled.angles
+        state.pulses[:] = compiled.pulses
+
+    def path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(repr(key)).hexdigest() + '.gait')
+
+    def load(self, key):
+        """ the routine compiled in the file of key, None for a missing, foreign or
+            unreadable file """
+
+        if not self.directory: return None
+
+        try:
+            with open(self.path(key), 'rb') as f:
+                compiled = read_compiled(f, self.robot.state)
+        except Exception:
+            return None
+
+        if compiled is not None: self.loads += 1
+        return compiled
+
+    def save(self, key, compiled):
+        """ writes the file of key, the robot has already moved so a failure only means
+            the routine is compiled again next time """
+
+        if not self.directory: return
+
+        path = self.path(key)
+
+        try:
+            with open(path + '.tmp', 'wb') as f:
+                write_compiled(f, self.robot.state, compiled, getattr(self.robot.drivers, 'freq', 0) or 0)
+
+            os.rename(path + '.tmp', path)
+        except Exception:
+            if os.path.exists(path + '.tmp'): os.remove(path + '.tmp')
+
+
+def limits(state):
+    return zip(state.min_pulses, state.max_pulses, state.maxes, state.leeways)
+
+
+def write_compiled(f, state, compiled, freq):
+
+    n = compiled.channels
+    f.write(HEADER.pack(MAGIC, VERSION, n, freq))
+
+    for calibration in limits(state):
+        f.write(CALIBRATION.pack(*calibration))
+
+    angles = [float('nan') if angle is None else angle for angle in compiled.angles]
+    f.write(ending_struct(n).pack(compiled.lead, *(angles + compiled.pulses.tolist())))
+
+    frame = frame_struct(n)
+
+    for i, delay in enumerate(compiled.delays):
+        f.write(frame.pack(delay, *compiled.frames[i * n:(i + 1) * n]))
+
+
+def read_compiled(f, state):
+    """ the Compiled in f, None unless it was written with the calibration of state """
+
+    data = f.read()
+
+    magic, version, n, _ = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION or n != len(state.pulses): return None
+
+    offset = HEADER.size
+    calibration = [CALIBRATION.unpack_from(data, offset + ch * CALIBRATION.size) for ch in xrange(n)]
+    if calibration != limits(state): return None
+
+    offset += n * CALIBRATION.size
+    ending, frame = ending_struct(n), frame_struct(n)
+
+    values = ending.unpack_from(data, offset)
+    lead, angles, pulses = values[0], values[1:n + 1], array('H', values[n + 1:])
+    offset += ending.size
+
+    if (len(data) - offset) % frame.size: return None
+
+    frames, delays = array('H'), array('d')
+
+    for start in xrange(offset, len(data), frame.size):
+        values = frame.unpack_from(data, start)
+        delays.append(values[0])
+        frames.extend(values[1:])
+
+    angles = [None if math.isnan(a) else int(a) if a == int(a) else a for a in angles]
+    return Compiled(n, lead, frames, delays, angles, pulses)
@@ -1,5 +1,13 @@
+from ..comm import trace
 from ..comm.pwm import PWM
-from time import sleep
+from ..comm.writer import BusWorker
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+import inspect
+from scheduler import Scheduler
+import signal
+from trajectory import Trajectory
 
 """ joint_key convention:
     R - right, L - left
@@ -18,17 +26,266 @@ joint_properties = {
     'N': (18, 150, 650)
 }
 
-driver1 = PWM(0x40)
-driver2 = PWM(0x41)
 
-driver1.setPWMFreq(60)
-driver2.setPWMFreq(60)
+class Stopped(Exception):
+    """ raised by frames and pauses while the drivers are stopped, until release() """
+
+
+def balanced_channels(chips = 2, properties = joint_properties):
+    """ a channel map for Drivers spreading the legs evenly over chips, each leg on one
+        chip in adjacent channels, left and right legs alternating so both tripods span
+        every chip """
+
+    groups = {}
+
+    for key, (ch, _, _) in properties.iteritems():
+        groups.setdefault(key[:2] if len(key) == 3 else key, []).append(ch)
+
+    loads, channels = [0] * chips, {}
+
+    for group in sorted(groups.values(), key = min):
+        chip = min(xrange(chips), key = lambda i: (loads[i], i))
+
+        for ch in sorted(group):
+            channels[ch] = chip, loads[chip]
+            loads[chip] += 1
+
+    return channels
+
+
+class Drivers:
+    """ the servo drivers of a robot.
+
+        addresses - each chip as an address on the default bus or as (busnum, address)
+        channels  - robot channel : (chip index, chip channel), by default chip i drives
+                    channels 16*i to 16*i + 15
+        parallel  - write the chips of different buses at the same time, one worker
+                    thread per bus, on by default when the chips span several buses
+        broadcast - send frames setting every channel to the same pulse through the ALL_LED
+                    registers, to every chip of a bus at once through ALLCALL. turn it off
+                    when other PCA9685s answering ALLCALL share the bus
+
+        each chip is created by factory(address, warm = warm, busnum = busnum) and set to
+        freq on first use. with warm = True chips that are already running keep their outputs """
+
+    def __init__(self, addresses = (0x40, 0x41), freq = 60, factory = PWM, warm = False,
+                 channels = None, parallel = None, broadcast = True):
+
+        self.addresses = [a if isinstance(a, tuple) else (-1, a) for a in addresses]
+        self.freq, self.factory, self.warm = freq, factory, warm
+        self.chips = [None] * len(addresses)
+
+        self.channels = channels
+        self.inverse = dict((v, k) for k, v in (channels or {}).iteritems())
+
+        self.used = [0] * len(addresses) # robot channels each chip drives
+        default = [(ch >> 4, ch & 15) for ch, _, _ in joint_properties.itervalues()]
+
+        for i, _ in (channels.itervalues() if channels else default):
+            if i < len(addresses): self.used[i] += 1
+
+        self.buses = sorted(set(busnum for busnum, _ in self.addresses))
+        self.parallel = len(self.buses) > 1 if parallel is None else parallel
+        self.broadcast = broadcast
+        self.workers = {}
+        self.stopped = False
+
+    def chip(self, i):
+
+        if self.chips[i] is None:
+            busnum, address = self.addresses[i]
+            driver = self.factory(address, warm = self.warm, busnum = busnum)
+            driver.setPWMFreq(self.freq)
+            self.chips[i] = driver
+
+        return self.chips[i]
+
+    def locate(self, ch):
+        """ (chip index, chip channel) of a robot channel """
+        return self.channels[ch] if self.channels else (ch >> 4, ch & 15)
+
+    def read(self):
+        """ returns channel : pulse as read back by the chips that were warm started """
+
+        pulses = {}
+
+        for i in xrange(len(self.addresses)):
+            driver = self.chip(i)
+            if driver.warm: self.decode(i, driver.cachedPWM(), pulses)
+
+        return pulses
+
+    def snapshot(self):
+        """ reads back every chip now, the mode registers and all LED registers in
+            block reads, and returns (chip index : modes, channel : pulse). use warm
+            drivers after a crash, creating a cold chip resets it first """
+
+        modes, pulses = {}, {}
+
+        for i in xrange(len(self.addresses)):
+            driver = self.chip(i)
+            modes[i] = driver.readModes()
+            self.decode(i, driver.readAllPWM() or [], pulses)
+
+        return modes, pulses
+
+    def decode(self, i, counts, pulses):
+        """ adds the pulses of chip i's (on, off) counts to channel : pulse """
+
+        for local, count in enumerate(counts):
+            ch = self.inverse.get((i, local)) if self.channels else 16*i + local
+            if count is None or ch is None: continue
+
+            on, off = count
+            pulses[ch] = 0 if off & 0x1000 else (off - on) & 0xFFF
+
+    def write(self, pulses):
+        """ sends a channel : pulse dict with one setPWMs call per chip, or a single
+            ALL_LED write per chip or per bus when the pulses are all the same. raises
+            Stopped after an emergency stop, a stop coming in during the write is sent
+            again once it is done """
+
+        if self.stopped: raise Stopped('emergency stop, release() to drive the servos again')
+
+        try:
+            self.transmit(pulses)
+        finally:
+            if self.stopped: self.cut()
+
+    def transmit(self, pulses):
+
+        if self.broadcast and len(pulses) == sum(self.used):
+            values = set(pulses.itervalues())
+
+            if len(values) == 1:
+                self.write_all(values.pop())
+                return
+
+        chips = {}
+
+        for ch, val in pulses.iteritems():
+            i, local = self.locate(ch)
+            chips.setdefault(i, {})[local] = (0, val)
+
+        used = self.used if self.broadcast else [0] * len(self.used)
+        buses = {}
+
+        for i in sorted(chips):
+            buses.setdefault(self.addresses[i][0], []).append((self.chip(i), chips[i], used[i]))
+
+        if not self.parallel or len(buses) < 2:
+            for busnum in sorted(buses):
+                send(buses[busnum])
+            return
+
+        jobs = [self.worker(busnum).submit(send, writes) for busnum, writes in buses.iteritems()]
+
+        for job in jobs:
+            job.wait()
+
+    def write_all(self, pulse):
+        """ sets every channel of every chip to pulse with one ALLCALL write per bus,
+            buses whose chips are all there already are skipped """
+
+        if self.stopped: raise Stopped('emergency stop, release() to drive the servos again')
+
+        for busnum in self.buses:
+            drivers = [self.chip(i) for i, (b, _) in enumerate(self.addresses) if b == busnum]
+
+            if all(counts == (0, pulse) for driver in drivers for counts in driver.cachedPWM()):
+                continue
+
+            failed = PWM.broadcastAllPWM(0, pulse, busnum) == -1
+
+            for driver in drivers:
+                if failed: driver.invalidateShadow()
+                else: driver.assumeAllPWM(0, pulse)
+
+    def emergency_stop(self):
+        """ turns every servo fully off with one single byte ALLCALL write per bus. takes
+            no locks and skips any queue, so a signal handler or a watchdog thread can call
+            it while a routine is running. the stop latches, every later frame raises
+            Stopped and nothing reaches the servos until release() """
+
+        self.stopped = True
+        self.cut()
+
+    def release(self):
+        """ ends an emergency stop, the servos stay off until a frame poses them """
+        self.stopped = False
+
+    def cut(self):
+
+        for busnum in self.buses:
+            PWM.emergencyStop(busnum)
+
+        for driver in self.chips:
+            if driver is not None: driver.invalidateShadow()
+
+    def arm(self, signals = (signal.SIGINT, signal.SIGTERM)):
+        """ cuts every servo as soon as one of signals arrives, then hands the signal
+            on to the handler installed before. the ALLCALL devices are opened here so
+            that the handler itself does nothing but write """
+
+        for busnum in self.buses:
+            PWM.allCall(busnum)
+
+        for signum in signals:
+            signal.signal(signum, self.stop_handler(signal.getsignal(signum)))
+
+    def stop_handler(self, previous):
+
+        def handler(signum, frame):
+            self.emergency_stop()
+
+            if callable(previous): previous(signum, frame)
+            elif previous != signal.SIG_IGN: raise SystemExit(128 + signum)
+
+        return handler
+
+    def worker(self, busnum):
+
+        if busnum not in self.workers:
+            self.workers[busnum] = BusWorker('hexy bus %d' % busnum)
+
+        return self.workers[busnum]
+
+
+def send(writes):
+    """ writes the chips of one bus, all in a single transfer when the bus can carry
+        several messages at once """
+
+    if len(writes) > 1 and PWM.setPWMsTogether([(driver, pulses) for driver, pulses, _ in writes]):
+        return
+
+    for driver, pulses, used in writes:
+        commit(driver, pulses, used)
+
+
+def commit(driver, pulses, used):
+    """ writes chip channel : (on, off) pulses to driver, as one setAllPWM when they
+        cover all of the used channels of the chip with the same counts """
+
+    if len(pulses) == used > 1:
+        counts = set(pulses.itervalues())
+
+        if len(counts) == 1:
+            driver.setAllPWM(*counts.pop())
+            return
+
+    driver.setPWMs(pulses)
+
+
+default_drivers = Drivers() # nothing touches the bus until the first write
 
 
 def drive(ch, val):
-    driver = driver1 if ch < 16 else driver2
-    ch = ch if ch < 16 else ch - 16    
-    driver.setPWM(ch, 0, val)
+    i, ch = default_drivers.locate(ch)
+    default_drivers.chip(i).setPWM(ch, 0, val)
+
+
+def flush(pulses):
+    default_drivers.write(pulses)
 
 
 def constrain(val, min_val, max_val):
@@ -37,23 +294,232 @@ def constrain(val, min_val, max_val):
 
 def remap(old_val, (old_min, old_max), (new_min, new_max)):
     new_diff = (new_max - new_min)*(old_val - old_min) / float((old_max - old_min))
-    return int(round(new_diff)) + new_min 
+    return int(round(new_diff)) + new_min
+
+
+class JointState(object):
+    """ angle, pulse and limits of every channel in joint_properties stored as parallel
+        arrays indexed by channel, with an angle to pulse lookup table per channel.
+        speeds holds the fastest a Trajectory may turn each channel, in degrees/s """
+
+    def __init__(self, properties = joint_properties, output = flush, pulses = None, scheduler = None,
+                 speed = 400):
+
+        size = max(ch for ch, _, _ in properties.itervalues()) + 1
+
+        self.angles = [None] * size
+        self.pulses = array('H', [0] * size)
+        self.min_pulses = array('H', [0] * size)
+        self.max_pulses = array('H', [0] * size)
+        self.maxes = array('h', [90] * size)
+        self.leeways = array('h', [0] * size)
+        self.speeds = array('H', [speed] * size)
+        self.tables = [None] * size
+
+        for ch, min_pulse, max_pulse in properties.itervalues():
+            self.min_pulses[ch], self.max_pulses[ch] = min_pulse, max_pulse
+            self.configure(ch, 90, 0)
+
+        self.output = output
+        self.pending = None # channel : pulse, collected while a frame is open
+        self.running = dict(pulses or {}) # channel : pulse read back from running drivers
+        self.scheduler = scheduler or Scheduler()
+
+    def configure(self, ch, maxx, leeway):
+        """ sets a channel's limits and rebuilds its table, entry i is the pulse
+            for angle i - (maxx + leeway) """
+
+        self.maxes[ch], self.leeways[ch] = maxx, leeway
+        span = (-maxx, maxx), (self.min_pulses[ch], self.max_pulses[ch])
+        reach = maxx + leeway
+
+        self.tables[ch] = array('H', [remap(angle, *span) for angle in xrange(-reach, reach + 1)])
+
+    def reach(self, ch):
+        return self.maxes[ch] + self.leeways[ch]
+
+    def angle_of(self, ch, pulse):
+        """ the reachable whole angle whose pulse is closest to pulse """
+
+        table, reach = self.tables[ch], self.maxes[ch] + self.leeways[ch]
+        i = min(bisect_left(table, pulse), len(table) - 1)
+
+        if i > 0 and pulse - table[i - 1] < table[i] - pulse: i -= 1
+        return i - reach
+
+    def adopt(self, ch):
+        """ takes over the read back pulse of a running channel instead of turning it off,
+            returns False when there is nothing to take over """
+
+        pulse = self.running.pop(ch, 0)
+        if not pulse: return False
+
+        self.angles[ch], self.pulses[ch] = self.angle_of(ch, pulse), pulse
+        return True
+
+    def pulse(self, ch, angle):
+        """ returns the constrained angle and its pulse """
+
+        reach = self.maxes[ch] + self.leeways[ch]
+        angle = constrain(angle, -reach, reach)
+
+        if angle == int(angle):
+            return angle, self.tables[ch][int(angle) + reach]
+
+        span = (-self.maxes[ch], self.maxes[ch]), (self.min_pulses[ch], self.max_pulses[ch])
+        return angle, remap(angle, *span)
+
+    def pose(self, ch, angle):
+
+        angle, pulse = self.pulse(ch, angle)
+
+        self.angles[ch], self.pulses[ch] = angle, pulse
+        self.drive(ch, pulse)
+
+    def off(self, ch):
+
+        self.angles[ch], self.pulses[ch] = None, 0
+        self.drive(ch, 0)
+
+    def update(self, channels, angles, pulses):
+        """ stores and drives already constrained angles and their pulses """
+
+        for ch, angle, pulse in zip(channels, angles, pulses):
+            self.angles[ch], self.pulses[ch] = angle, pulse
+
+        with self.frame():
+            self.pending.update(zip(channels, pulses))
+
+    def group(self, channels):
+        return JointGroup(self, channels)
+
+    def drive(self, ch, pulse):
+
+        if self.pending is not None:
+            self.pending[ch] = pulse
+        else:
+            self.send({ch: pulse})
+
+    def send(self, pulses):
+
+        self.scheduler.mark()
+        self.output(pulses)
+
+    @contextmanager
+    def frame(self):
+        """ poses inside the block only collect their target pulses, which are
+            sent together when the outermost frame exits """
+
+        if self.pending is not None:
+            yield
+            return
+
+        self.pending = {}
+
+        try:
+            yield
+        finally:
+            pulses, self.pending = self.pending, None
+            if pulses: self.send(pulses)
+
+
+class Snapshot(object):
+    """ the chips of a robot read back at one time
+
+        modes  - chip index : MODE1, MODE2 and PRESCALE decoded by PWM.readModes
+        pulses - channel : pulse of every joint, 0 when off
+        angles - channel : angle through the channel's calibration, None when off """
+
+    def __init__(self, state, modes, pulses):
+
+        size = len(state.pulses)
+
+        self.modes = modes
+        self.pulses = dict((ch, pulse) for ch, pulse in pulses.iteritems() if ch < size)
+        self.angles = dict((ch, state.angle_of(ch, pulse) if pulse else None)
+                           for ch, pulse in self.pulses.iteritems())
+
+    def joints(self):
+        """ joint key : (pulse, angle), keyed as in joint_properties """
+
+        return dict((key, (self.pulses.get(ch), self.angles.get(ch)))
+                    for key, (ch, _, _) in joint_properties.iteritems())
+
+    def differences(self, state):
+        """ (channel, pulse sent, pulse read) of every channel where the chips don't
+            hold what state last sent """
+
+        return [(ch, state.pulses[ch], pulse) for ch, pulse in sorted(self.pulses.iteritems())
+                if state.pulses[ch] != pulse]
+
+
+class JointGroup(object):
+    """ a fixed set of channels posed together, row i of the tables holds the
+        constrained angles and pulses of every channel for angle i - reach """
+
+    def __init__(self, state, channels):
+
+        self.state, self.channels = state, tuple(channels)
+        self.reach = max(state.reach(ch) for ch in self.channels)
+
+        rows = [[state.pulse(ch, angle) for ch in self.channels]
+                for angle in xrange(-self.reach, self.reach + 1)]
+
+        self.angle_rows = [tuple(angle for angle, _ in row) for row in rows]
+        self.pulse_rows = [tuple(pulse for _, pulse in row) for row in rows]
+
+    def pose(self, angle = 0):
+        """ poses every channel in the group to the same angle """
+
+        angle = constrain(angle, -self.reach, self.reach)
+
+        if angle != int(angle):
+            self.pose_each([angle] * len(self.channels))
+            return
+
+        row = int(angle) + self.reach
+        self.state.update(self.channels, self.angle_rows[row], self.pulse_rows[row])
+
+    def pose_each(self, angles):
+        """ poses each channel to its respective angle """
+
+        pulses = [self.state.pulse(ch, angle) for ch, angle in zip(self.channels, angles)]
+        self.state.update(self.channels, [angle for angle, _ in pulses], [pulse for _, pulse in pulses])
+
+
+def routines(robot):
+    """ names of the motion routines the classes of robot add to HexapodCore """
+
+    names = set()
+
+    for cls in inspect.getmro(robot.__class__):
+        if cls is HexapodCore: break
+        names.update(name for name, value in vars(cls).iteritems()
+                     if inspect.isfunction(value) and not name.startswith('_'))
+
+    return sorted(names)
 
 
 class HexapodCore:
 
-    def __init__(self):
+    def __init__(self, drivers = None, scheduler = None):
+
+        self.drivers = drivers or default_drivers
+
+        running = self.drivers.read() if self.drivers.warm else None
+        self.state = JointState(output = self.drivers.write, pulses = running, scheduler = scheduler)
+        self.scheduler = self.state.scheduler
 
-        self.neck = Joint("neck", 'N')
+        self.neck = Joint("neck", 'N', state = self.state)
 
-        self.left_front = Leg('left front', 'LFH', 'LFK', 'LFA')
-        self.right_front = Leg('right front', 'RFH', 'RFK', 'RFA')
+        self.left_front = Leg('left front', 'LFH', 'LFK', 'LFA', self.state)
+        self.right_front = Leg('right front', 'RFH', 'RFK', 'RFA', self.state)
 
-        self.left_middle = Leg('left middle', 'LMH', 'LMK', 'LMA')
-        self.right_middle = Leg('right middle', 'RMH', 'RMK', 'RMA')
-        
-        self.left_back = Leg('left back', 'LBH', 'LBK', 'LBA')
-        self.right_back = Leg('right back', 'RBH', 'RBK', 'RBA')
+        self.left_middle = Leg('left middle', 'LMH', 'LMK', 'LMA', self.state)
+        self.right_middle = Leg('right middle', 'RMH', 'RMK', 'RMA', self.state)
+
+        self.left_back = Leg('left back', 'LBH', 'LBK', 'LBA', self.state)
+        self.right_back = Leg('right back', 'RBH', 'RBK', 'RBA', self.state)
 
         self.legs = [self.left_front, self.right_front,
                      self.left_middle, self.right_middle,
@@ -64,7 +530,7 @@ class HexapodCore:
 
         self.tripod1 = [self.left_front, self.right_middle, self.left_back]
         self.tripod2 = [self.right_front, self.left_middle, self.right_back]
-        
+
         self.hips, self.knees, self.ankles = [], [], []
 
         for leg in self.legs:
@@ -72,35 +538,87 @@ class HexapodCore:
             self.knees.append(leg.knee)
             self.ankles.append(leg.ankle)
 
+        self.hip_group = self.state.group(hip.channel for hip in self.hips)
+        self.knee_group = self.state.group(knee.channel for knee in self.knees)
+        self.ankle_group = self.state.group(ankle.channel for ankle in self.ankles)
+
+    def frame(self):
+        """ with hexy.frame(): ... sends every pose in the block in one flush per driver """
+        return self.state.frame()
+
+    def pause(self, t):
+        """ waits until t seconds after the previous pause's deadline, raises Stopped
+            after an emergency stop so the routine ends there """
+
+        if getattr(self.drivers, 'stopped', False): raise Stopped('emergency stop')
+        self.state.scheduler.pause(t)
+
+    def glide(self, targets, duration, profile = 'minjerk'):
+        """ eases the joints to a channel : angle dict of targets over duration seconds,
+            a frame per servo period, see Trajectory """
+        Trajectory(self.state, targets, duration, profile, self.drivers.freq).play(self)
+
+    def emergency_stop(self):
+        """ cuts every servo at once and keeps them off, see Drivers.emergency_stop """
+        self.drivers.emergency_stop()
+
+    def release(self):
+        """ lets frames through again after an emergency stop """
+        self.drivers.release()
+
+    def snapshot(self):
+        """ reads the whole robot back from its chips, see Snapshot """
+
+        modes, pulses = self.drivers.snapshot()
+        return Snapshot(self.state, modes, pulses)
+
+    def sync(self, snapshot = None):
+        """ takes the read back pulses over as the joints' pulses and angles, so that
+            Joint.angle is right again after a restart, returns the snapshot """
+
+        snapshot = snapshot or self.snapshot()
+
+        for ch, pulse in snapshot.pulses.iteritems():
+            self.state.angles[ch], self.state.pulses[ch] = snapshot.angles[ch], pulse
+
+        return snapshot
+
     def off(self):
+        """ one frame of zero pulses, which the drivers send as a single ALLCALL write """
 
-        self.neck.off()
-        
-        for leg in self.legs:
-            leg.off() 
+        with self.frame():
+            self.neck.off()
 
+            for leg in self.legs:
+                leg.off()
 
-class Leg:
 
-    def __init__(self, name, hip_key, knee_key, ankle_key):
+class Leg(object):
+
+    __slots__ = ('hip', 'knee', 'ankle', 'name', 'joints', 'state')
+
+    def __init__(self, name, hip_key, knee_key, ankle_key, state = None):
 
         max_hip, max_knee, knee_leeway = 45, 50, 10
-        
-        self.hip = Joint("hip", hip_key, max_hip)
-        self.knee = Joint("knee", knee_key, max_knee, leeway = knee_leeway)
-        self.ankle = Joint("ankle", ankle_key)
+
+        self.state = state or default_state
+
+        self.hip = Joint("hip", hip_key, max_hip, state = self.state)
+        self.knee = Joint("knee", knee_key, max_knee, leeway = knee_leeway, state = self.state)
+        self.ankle = Joint("ankle", ankle_key, state = self.state)
 
         self.name = name
         self.joints = [self.hip, self.knee, self.ankle]
 
     def pose(self, hip_angle = 0, knee_angle = 0, ankle_angle = 0):
 
-        self.hip.pose(hip_angle)
-        self.knee.pose(knee_angle)
-        self.ankle.pose(ankle_angle)
+        with self.state.frame():
+            self.hip.pose(hip_angle)
+            self.knee.pose(knee_angle)
+            self.ankle.pose(ankle_angle)
 
     def move(self, knee_angle = None, hip_angle = None, offset = 100):
-        """ knee_angle < 0 means thigh is raised, ankle's angle will be set to the specified 
+        """ knee_angle < 0 means thigh is raised, ankle's angle will be set to the specified
             knee angle minus the offset. offset best between 80 and 110 """
 
         if knee_angle == None: knee_angle = self.knee.angle
@@ -110,44 +628,55 @@ class Leg:
 
     def replant(self, raised, floor, offset, t = 0.1):
 
-        self.move(raised)
-        sleep(t)
+        with trace.span('replant'):
+            self.move(raised)
+            self.state.scheduler.pause(t)
 
-        self.move(floor, offset)
-        sleep(t)
+            self.move(floor, offset)
+            self.state.scheduler.pause(t)
 
     def off(self):
-        for joint in self.joints:
-            joint.off()
-        
+        with self.state.frame():
+            for joint in self.joints:
+                joint.off()
+
     def __repr__(self):
         return 'leg: ' + self.name
 
 
-class Joint:
+class Joint(object):
+    """ a view of one channel of a JointState """
+
+    __slots__ = ('joint_type', 'name', 'channel', 'state')
 
-    def __init__(self, joint_type, jkey, maxx = 90, leeway = 0):
+    def __init__(self, joint_type, jkey, maxx = 90, leeway = 0, state = None):
 
         self.joint_type, self.name =  joint_type, jkey
-        self.channel, self.min_pulse, self.max_pulse = joint_properties[jkey]
-        self.max, self.leeway = maxx, leeway
+        self.channel = joint_properties[jkey][0]
+        self.state = state or default_state
 
-        self.off()
+        self.state.configure(self.channel, maxx, leeway)
 
-    def pose(self, angle = 0):
+        if not self.state.adopt(self.channel):
+            self.off()
+
+    angle = property(lambda self: self.state.angles[self.channel])
+    pulse = property(lambda self: self.state.pulses[self.channel])
+    min_pulse = property(lambda self: self.state.min_pulses[self.channel])
+    max_pulse = property(lambda self: self.state.max_pulses[self.channel])
+    max = property(lambda self: self.state.maxes[self.channel])
+    leeway = property(lambda self: self.state.leeways[self.channel])
 
-        angle = constrain(angle, -(self.max + self.leeway), self.max + self.leeway)
-        pulse = remap(angle, (-self.max, self.max), (self.min_pulse, self.max_pulse))
+    def pose(self, angle = 0):
+        self.state.pose(self.channel, angle)
 
-        drive(self.channel, pulse)
-        self.angle = angle
-        
-        #print repr(self), ':', 'pulse', pulse
+        #print repr(self), ':', 'pulse', self.pulse
 
     def off(self):
-        drive(self.channel, 0)
-        self.angle = None
+        self.state.off(self.channel)
 
     def __repr__(self):
         return 'joint: ' + self.joint_type + ' : ' + self.name + ' angle: ' + str(self.angle)
- 
+
+
+default_state = JointState() # shared by legs and joints created without a state
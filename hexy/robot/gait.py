@@ -0,0 +1,178 @@
+from math import cos, pi, radians, sin
+from kinematics import Kinematics, Unreachable
+
+""" continuous walking steered by velocity commands. every leg follows a precomputed
+    phase table, stance then swing, shifted by its own phase offset, and the stride of
+    each foot comes from the commanded body velocity at that foot.
+
+    gait = Gait(hexy, 'ripple')
+    motion = Motion(hexy)
+    motion.cruise(gait)             # runs until the task is cancelled
+    gait.command(forward = 40)      # mm/s, from any thread
+    gait.command(forward = 30, yaw = 15)
+    gait.switch('tripod')           # blends over, the robot keeps walking """
+
+# phase offset of each leg in the order of HexapodCore.legs, left front, right front,
+# left middle, right middle, left back, right back, and the duty factor, the fraction
+# of the cycle a foot is on the ground
+GAITS = {
+    'tripod': ((0.0, 0.5, 0.5, 0.0, 0.0, 0.5), 0.5),
+    'ripple': ((2 / 3., 1 / 6., 1 / 3., 5 / 6., 0.0, 0.5), 2 / 3.),
+    'wave': ((2 / 6., 5 / 6., 1 / 6., 4 / 6., 0.0, 3 / 6.), 5 / 6.)
+}
+
+
+def phase_table(name, resolution = 120):
+    """ for each leg, resolution (stroke, lift) entries over one cycle. stroke runs from
+        0.5, the foot forward at touchdown, to -0.5 at liftoff during the stance and back
+        on an eased path during the swing, lift goes from 0 up to 1 and down in the swing """
+
+    offsets, duty = GAITS[name]
+    table = []
+
+    for offset in offsets:
+        row = []
+
+        for k in xrange(resolution):
+            p = (float(k) / resolution - offset) % 1.0
+
+            if p < duty:
+                row.append((0.5 - p / duty, 0.0))
+            else:
+                u = (p - duty) / (1.0 - duty)
+                row.append((-0.5 + (1 - cos(pi * u)) / 2, sin(pi * u)))
+
+        table.append(row)
+
+    return table
+
+
+class Gait:
+    """ turns forward, sideways (mm/s) and yaw (degrees/s) commands into foot placements
+        at rate frames per second, one cycle lasting period seconds.
+
+        commands are followed through a first order filter of smoothing seconds, so the
+        strides change gradually, and strides are scaled down to max_stride mm. feet are
+        raised lift mm in the swing, less while barely moving, so with no command the
+        robot stands. joints are held at their limits where a raised foot would pass
+        them. switching gaits crossfades the foot positions over blend seconds """
+
+    def __init__(self, robot, name = 'tripod', period = 1.0, rate = 60, height = 86, spread = 35,
+                 lift = 15, max_stride = 30, smoothing = 0.25, kinematics = None, resolution = 120):
+
+        if name not in GAITS: raise ValueError('unknown gait ' + name)
+
+        self.robot = robot
+        self.kinematics = kinematics or Kinematics(robot)
+        self.stance = self.kinematics.stance(height, spread)
+        self.neutral = self.stance
+
+        self.period, self.rate, self.lift = period, rate, lift
+        self.max_stride, self.smoothing = max_stride, smoothing
+
+        self.resolution = resolution
+        self.tables = dict((gait, phase_table(gait, resolution)) for gait in GAITS)
+
+        self.name, self.previous = name, None
+        self.mix, self.blend = 1.0, 0.0
+
+        self.phase = 0.0
+        self.target = (0.0, 0.0, 0.0)
+        self.velocity = (0.0, 0.0, 0.0)
+
+        self.running = False
+        self.frames, self.skipped = 0, 0
+
+    def command(self, forward = 0.0, sideways = 0.0, yaw = 0.0):
+        """ sets the velocity setpoints, safe to call from another thread while running """
+        self.target = (float(forward), float(sideways), float(yaw))
+
+    def shift(self, dx = 0.0, dy = 0.0, dz = 0.0):
+        """ moves the body by the offset in mm from its stance, the feet by the opposite """
+        self.neutral = self.kinematics.shift(self.stance, -dx, -dy, -dz)
+
+    def switch(self, name, blend = 0.5):
+        """ changes gait without stopping, crossfading for blend seconds """
+
+        if name not in GAITS: raise ValueError('unknown gait ' + name)
+        if name == self.name: return
+
+        self.previous, self.name = self.name, name
+        self.mix, self.blend = 0.0, blend
+
+    def strides(self, duty):
+        """ the stance displacement of every foot at the current velocity, and how
+            much of the full lift to use """
+
+        forward, sideways, yaw = self.velocity
+        w, stance = radians(yaw), duty * self.period
+
+        strides = [((forward - w * y) * stance, (sideways + w * x) * stance) for x, y, _ in self.neutral]
+
+        longest = max(abs(sx) + abs(sy) for sx, sy in strides)
+        scale = min(1.0, self.max_stride / longest) if longest else 1.0
+
+        return [(sx * scale, sy * scale) for sx, sy in strides], min(1.0, longest * scale / 5.0)
+
+    def feet(self, name):
+        """ foot positions of gait name at the current phase and velocity """
+
+        strides, moving = self.strides(GAITS[name][1])
+        table, k = self.tables[name], int(self.phase * self.resolution) % self.resolution
+        lift = self.lift * moving
+
+        feet = []
+
+        for (x, y, z), (sx, sy), row in zip(self.neutral, strides, table):
+            stroke, raised = row[k]
+            feet.append((x + stroke * sx, y + stroke * sy, z + raised * lift))
+
+        return feet
+
+    def step(self, dt):
+        """ advances velocity, blend and phase by dt seconds, returns the new feet """
+
+        k = min(1.0, dt / self.smoothing) if self.smoothing else 1.0
+        self.velocity = tuple(v + (t - v) * k for v, t in zip(self.velocity, self.target))
+
+        feet = self.feet(self.name)
+
+        if self.previous is not None:
+            self.mix = min(1.0, self.mix + dt / self.blend) if self.blend else 1.0
+            a = (1 - cos(pi * self.mix)) / 2
+
+            feet = [tuple(p + (n - p) * a for p, n in zip(old, new))
+                    for old, new in zip(self.feet(self.previous), feet)]
+
+            if self.mix >= 1.0: self.previous = None
+
+        self.phase = (self.phase + dt / self.period) % 1.0
+        return feet
+
+    def tick(self):
+        """ sends one frame, a placement no leg can reach is skipped and counted """
+
+        feet = self.step(1.0 / self.rate)
+
+        try:
+            self.kinematics.place(feet, clamp = True)
+            self.frames += 1
+        except Unreachable:
+            self.skipped += 1
+
+    def run(self, duration = None):
+        """ walks at rate frames per second until duration seconds passed or stop() """
+
+        t, elapsed = 1.0 / self.rate, 0.0
+        self.running = True
+
+        try:
+            while self.running and (duration is None or elapsed < duration):
+                self.tick()
+                self.robot.pause(t)
+                elapsed += t
+        finally:
+            self.running = False
+
+    def stop(self):
+        self.running = False
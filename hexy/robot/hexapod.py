@@ -1,5 +1,4 @@
 from core import HexapodCore
-from time import sleep
 
 class Hexapod(HexapodCore):
 
@@ -20,53 +19,68 @@ class Hexapod(HexapodCore):
 
     def curl_up(self, die = False, t = 0.2):
 
-        for leg in self.legs:
-            leg.pose(hip_angle = 0, 
-                     knee_angle = -(leg.knee.max + leg.knee.leeway), 
-                     ankle_angle = leg.ankle.max)
+        with self.frame():
+            for leg in self.legs:
+                leg.pose(hip_angle = 0, 
+                         knee_angle = -(leg.knee.max + leg.knee.leeway), 
+                         ankle_angle = leg.ankle.max)
 
-        sleep(t)
+        self.pause(t)
 
         if die: self.off()
         
     def lie_flat(self, t = 0.15):
         
-        for leg in self.legs:
-            leg.pose()
+        with self.frame():
+            for leg in self.legs:
+                leg.pose()
             
-        sleep(t)
+        self.pause(t)
 
-    def lie_down(self, maxx = 50, step = 4, t = 0.15):
-        
-        for angle in xrange(maxx, -(maxx + 1), -step):
-            self.squat(angle)
+    def lie_down(self, maxx = 50, step = None, t = 0.15, duration = 0.5, profile = 'minjerk'):
+        """ step, the degrees per frame of the loop the glide replaced, still sets the
+            pace as a frame per step """
+
+        if step: duration = 2.0 * maxx / step / self.drivers.freq
+
+        self.squat(-maxx, duration = duration, profile = profile)
 
-        sleep(t)
+        self.pause(t)
 
-    def get_up(self, maxx = 70, step = 4):
+    def get_up(self, maxx = 70, step = None, duration = 0.6, profile = 'minjerk'):
+        """ tucks the feet in, then pushes the body up. step sets the pace as in lie_down """
 
-        for angle in xrange(-maxx, maxx + 1, step):
-            self.squat(angle)
+        if step: duration = 2.0 * maxx / step / self.drivers.freq
+
+        self.squat(-maxx, duration = duration / 3, profile = profile)
+        self.squat(maxx, duration = duration, profile = profile)
 
         self.default()
 
     def look(self, angle = 0, t = 0.05):
         self.neck.pose(angle)
-        sleep(t)
+        self.pause(t)
 
     def twist_hip(self, angle = 0, t = 0.1):
 
-        for hip in self.hips:
-            hip.pose(angle)
+        self.hip_group.pose(angle)
 
-        sleep(t)
+        self.pause(t)
         
-    def squat(self, angle, t = 0):
+    def squat(self, angle, t = 0, duration = 0, profile = 'minjerk'):
+        """ with a duration the knees and ankles glide there instead of jumping """
+
+        if duration:
+            targets = dict([(knee.channel, angle) for knee in self.knees] +
+                           [(ankle.channel, angle - 100) for ankle in self.ankles])
+            self.glide(targets, duration, profile)
 
-        for leg in self.legs:
-            leg.move(knee_angle = angle)
+        else:
+            with self.frame():
+                self.knee_group.pose(angle)
+                self.ankle_group.pose(angle - 100) # as Leg.move with its default offset
 
-        sleep(t)
+        self.pause(t)
 
     def walk(self, offset = 25 , swing =  25, raised = -30, floor = 50, repetitions = 4, t = 0.2):
         """ if swing > 0, hexy moves forward else backward """
@@ -78,6 +92,12 @@ class Hexapod(HexapodCore):
             self.stride(self.tripod1, self.tripod2, swings, raised, floor, t)
             self.stride(self.tripod2, self.tripod1, reverse_swings, raised, floor, t)
 
+    def cruise(self, gait, duration = None):
+        """ walks with gait, a gait.Gait steered by its commands, for duration seconds
+            or until the task running it is cancelled """
+
+        gait.run(duration)
+
     def rotate(self, offset = 40, raised = -30, floor = 50, repetitions = 5, t = 0.2):
         """ if offset > 0, hexy rotates left, else right """
        
@@ -87,11 +107,12 @@ class Hexapod(HexapodCore):
             self.uniform_move(self.tripod2, None, raised, t)
             self.uniform_move(self.tripod2, offset, floor, t)
 
-            #raise tripod1
-            self.uniform_move(self.tripod1, -offset, raised) 
-            
-            #swing tripod2's hips to an -offset 
-            self.uniform_move(self.tripod2, -offset, None, t)
+            #raise tripod1 and swing tripod2's hips to an -offset 
+            with self.frame():
+                self.uniform_move(self.tripod1, -offset, raised) 
+                self.uniform_move(self.tripod2, -offset, None)
+
+            self.pause(t)
             
             #lower tripod1
             self.uniform_move(self.tripod1, 0, floor, t)
@@ -102,32 +123,37 @@ class Hexapod(HexapodCore):
             second_tripod's legs retrack by swinging to the opposite direction """
 
         self.simultaneous_move(first_tripod, knee_angle = raised)
-        sleep(t)
+        self.pause(t)
         
-        self.simultaneous_move(second_tripod, swing[::-1])
-        self.simultaneous_move(first_tripod, swing, floor)
-        sleep(t)
+        with self.frame():
+            self.simultaneous_move(second_tripod, swing[::-1])
+            self.simultaneous_move(first_tripod, swing, floor)
+
+        self.pause(t)
 
     def tilt_side(self, left_angle = 50, right_angle = 0, t = 0.2):
         """ if left_angle > right_angle, left side is higher than right side """
         
-        self.uniform_move(legs = self.left_legs, knee_angle = left_angle)
-        self.uniform_move(legs = self.right_legs, knee_angle = right_angle)
-        sleep(t)
+        with self.frame():
+            self.uniform_move(legs = self.left_legs, knee_angle = left_angle)
+            self.uniform_move(legs = self.right_legs, knee_angle = right_angle)
+
+        self.pause(t)
 
     def tilt(self, front_angle = 50, middle_angle = 25, back_angle = 0, t = 0.2):
         """ if front_angle > middle_angle > back_angle hexy's front is higher than his back """
 
-        self.right_front.move(knee_angle = front_angle)
-        self.left_front.move(knee_angle = front_angle)
+        with self.frame():
+            self.right_front.move(knee_angle = front_angle)
+            self.left_front.move(knee_angle = front_angle)
 
-        self.right_middle.move(knee_angle = middle_angle)
-        self.left_middle.move(knee_angle = middle_angle)
+            self.right_middle.move(knee_angle = middle_angle)
+            self.left_middle.move(knee_angle = middle_angle)
 
-        self.right_back.move(knee_angle = back_angle)
-        self.left_back.move(knee_angle = back_angle)
+            self.right_back.move(knee_angle = back_angle)
+            self.left_back.move(knee_angle = back_angle)
 
-        sleep(t)
+        self.pause(t)
 
     def default(self, offset = 45, floor = 60, raised = -30,  t = 0.2):
         """ Hexy's default pose, offset > 0 brings the front and back legs to the side """ 
@@ -145,16 +171,18 @@ class Hexapod(HexapodCore):
     def uniform_move(self, legs, hip_angle = None, knee_angle = None, t = 0):
         """ moves all legs with hip_angle, knee_angle """
         
-        for leg in legs:
-            leg.move(knee_angle, hip_angle)
+        with self.frame():
+            for leg in legs:
+                leg.move(knee_angle, hip_angle)
 
-        sleep(t)
+        self.pause(t)
 
     def simultaneous_move(self, legs, swings = [None, None, None], knee_angle = None, t = 0):
         """ moves all legs with knee_angle to the respective hip angles at 'swing' """
         
-        for leg, hip_angle in zip(legs, swings):
-            leg.move(knee_angle, hip_angle)
+        with self.frame():
+            for leg, hip_angle in zip(legs, swings):
+                leg.move(knee_angle, hip_angle)
 
-        sleep(t)
+        self.pause(t)
 
@@ -0,0 +1,169 @@
+from math import acos, atan2, cos, degrees, hypot, radians, sin
+
+""" foot positions to joint angles for all six legs.
+
+    body frame - millimetres from the centre of the body, x forward, y to the left,
+                 z up, so feet on the ground have z < 0
+    mount      - (x, y, yaw) of a leg's hip joint in the body frame, yaw in degrees
+                 counterclockwise from x, the direction the leg points at hip angle 0
+
+    joint angles follow the routines in hexapod.py: a positive hip angle turns the
+    leg counterclockwise seen from above, a negative knee angle raises the thigh, and
+    the ankle at knee - offset keeps the tibia vertical, as Leg.move does.
+
+    kinematics = Kinematics(hexy)
+    kinematics.place(kinematics.stance(height = 80))
+    kinematics.place([(x, y, z + 20) for x, y, z in feet]) """
+
+# measured on an Arcbotics Hexy, hip axis to knee axis to ankle axis to the tip of the foot
+COXA, FEMUR, TIBIA = 26.0, 49.0, 52.0
+
+MOUNTS = {
+    'left front': (60.0, 40.0, 45.0),   'right front': (60.0, -40.0, -45.0),
+    'left middle': (0.0, 50.0, 90.0),   'right middle': (0.0, -50.0, -90.0),
+    'left back': (-60.0, 40.0, 135.0),  'right back': (-60.0, -40.0, -135.0)
+}
+
+
+class Unreachable(ValueError):
+    """ raised for a placement some legs can't reach, legs holds their names """
+
+    def __init__(self, legs):
+        ValueError.__init__(self, 'out of reach: ' + ', '.join(legs))
+        self.legs = legs
+
+
+class Kinematics:
+    """ solves the joint angles of every leg of robot at once. the solution is a frame
+        of whole-degree angles, so pulses come straight from the JointState tables and
+        the joint limits (Joint.max + leeway) are checked before anything is sent.
+
+        there is no numpy on the Pi Zero this runs on, so instead of array operations
+        each call runs one tight pass over column lists with the trigonometry bound
+        to locals, and trajectories can be solved ahead of time with frames() """
+
+    def __init__(self, robot, coxa = COXA, femur = FEMUR, tibia = TIBIA, mounts = MOUNTS, offset = 100):
+
+        self.robot, self.state = robot, robot.state
+        self.coxa, self.femur, self.tibia = coxa, femur, tibia
+        self.tilt = offset - 90 # ankle angle, relative to the knee, of a vertical tibia
+
+        self.legs = list(robot.legs)
+        self.names = [leg.name for leg in self.legs]
+
+        self.mount_x = [mounts[name][0] for name in self.names]
+        self.mount_y = [mounts[name][1] for name in self.names]
+        self.mount_yaw = [radians(mounts[name][2]) for name in self.names]
+
+        self.channels = tuple(joint.channel for leg in self.legs for joint in leg.joints)
+        self.reaches = [self.state.reach(ch) for ch in self.channels]
+
+    def stance(self, height = 80, spread = 40):
+        """ feet spread mm out from each hip along its hip angle 0 direction, height
+            mm below the hips """
+
+        return [(x + (self.coxa + spread) * cos(yaw), y + (self.coxa + spread) * sin(yaw), -height)
+                for x, y, yaw in zip(self.mount_x, self.mount_y, self.mount_yaw)]
+
+    def forward(self, angles = None):
+        """ foot positions for a flat list of hip, knee, ankle angles per leg, the
+            current angles by default """
+
+        if angles is None: angles = [self.state.angles[ch] for ch in self.channels]
+
+        coxa, femur, tibia, tilt = self.coxa, self.femur, self.tibia, self.tilt
+        feet = []
+
+        for i in xrange(len(self.legs)):
+            hip, knee, ankle = angles[3*i:3*i + 3]
+
+            yaw = self.mount_yaw[i] + radians(hip)
+            thigh = radians(-knee)
+            shin = thigh + radians(ankle + tilt)
+
+            r = coxa + femur * cos(thigh) + tibia * cos(shin)
+            z = femur * sin(thigh) + tibia * sin(shin)
+
+            feet.append((self.mount_x[i] + r * cos(yaw), self.mount_y[i] + r * sin(yaw), z))
+
+        return feet
+
+    def solve(self, feet, clamp = False):
+        """ returns the flat list of whole-degree hip, knee, ankle angles placing each
+            leg's foot at its body frame position, with the names of the legs that
+            can't reach theirs or would go past a joint limit. with clamp, angles past
+            a limit are held at the limit instead, as Joint.pose does """
+
+        coxa, femur, tibia, tilt = self.coxa, self.femur, self.tibia, self.tilt
+        ff, tt, span, fold = femur * femur, tibia * tibia, femur + tibia, abs(femur - tibia)
+        reaches, angles, unreachable = self.reaches, [], []
+
+        for i, (x, y, z) in enumerate(feet):
+            dx, dy = x - self.mount_x[i], y - self.mount_y[i]
+            yaw = degrees(atan2(dy, dx) - self.mount_yaw[i])
+            hip = int(round((yaw + 180) % 360 - 180))
+
+            r = hypot(dx, dy) - coxa
+            d = hypot(r, z)
+
+            if not fold <= d <= span:
+                unreachable.append(self.names[i])
+                angles += [hip, 0, 0]
+                continue
+
+            thigh = atan2(z, r) + acos(max(-1.0, min(1.0, (ff + d * d - tt) / (2 * femur * d))))
+            shin = atan2(z - femur * sin(thigh), r - femur * cos(thigh))
+
+            knee = int(round(-degrees(thigh)))
+            ankle = int(round(degrees(shin - thigh))) - tilt
+
+            if abs(hip) > reaches[3*i] or abs(knee) > reaches[3*i + 1] or abs(ankle) > reaches[3*i + 2]:
+                if not clamp:
+                    unreachable.append(self.names[i])
+                else:
+                    hip = max(-reaches[3*i], min(reaches[3*i], hip))
+                    knee = max(-reaches[3*i + 1], min(reaches[3*i + 1], knee))
+                    ankle = max(-reaches[3*i + 2], min(reaches[3*i + 2], ankle))
+
+            angles += [hip, knee, ankle]
+
+        return angles, unreachable
+
+    def pulses(self, angles):
+        """ the pulses of a solved frame, read from the JointState tables """
+
+        tables = self.state.tables
+        return [tables[ch][angle + reach] for ch, angle, reach in zip(self.channels, angles, self.reaches)]
+
+    def place(self, feet, clamp = False):
+        """ poses every leg in one frame so its foot lands at its position in feet,
+            raises Unreachable without moving anything if a leg can't get there """
+
+        angles, unreachable = self.solve(feet, clamp)
+        if unreachable: raise Unreachable(unreachable)
+
+        self.state.update(self.channels, angles, self.pulses(angles))
+
+    def shift(self, feet, dx = 0, dy = 0, dz = 0):
+        """ feet moved by the same offset, e.g. to raise the body by lowering every foot """
+        return [(x + dx, y + dy, z + dz) for x, y, z in feet]
+
+    def frames(self, path):
+        """ solves a trajectory, a sequence of placements, ahead of time into
+            (angles, pulses) frames for play() """
+
+        frames = []
+
+        for feet in path:
+            angles, unreachable = self.solve(feet)
+            if unreachable: raise Unreachable(unreachable)
+            frames.append((angles, self.pulses(angles)))
+
+        return frames
+
+    def play(self, frames, t = 0.05):
+        """ sends solved frames t seconds apart """
+
+        for angles, pulses in frames:
+            self.state.update(self.channels, angles, pulses)
+            self.robot.pause(t)
@@ -1,5 +1,5 @@
 from hexapod import Hexapod
-from time import sleep
+from timeline import Timeline
 
 class HexapodPro(Hexapod):
 
@@ -13,22 +13,21 @@ class HexapodPro(Hexapod):
 
     def point(self, t = 0.75):
         
-        self.left_front.hip.pose(-45)
-        self.left_front.knee.pose(-50)
-        self.left_front.ankle.pose(-55)
+        self.left_front.pose(-45, -50, -55)
 
-        sleep(t)
+        self.pause(t)
 
     def wave(self, repetitions = 5, t = 0.2):
         
-        self.left_front.ankle.pose()
-        self.left_front.knee.pose(-50)
+        with self.frame():
+            self.left_front.ankle.pose()
+            self.left_front.knee.pose(-50)
         
         for r in xrange(repetitions):
             self.left_front.hip.pose(-45)
-            sleep(t)
+            self.pause(t)
             self.left_front.hip.pose(45)
-            sleep(t)
+            self.pause(t)
 
     def dance_twist(self, maxx = 45, step = 5, repetitions = 3, t = 0.01):
 
@@ -48,17 +47,20 @@ class HexapodPro(Hexapod):
 
     def lean_back(self, offset = 45, back_knee = 0, middle_knee = 40, raised = -30, t = 0.2):
         """ brings the back legs even further to the back and the middle legs to the front
-            and then brings his front legs up in the air """ 
+            and then brings his front legs up in the air. each leg goes up as the one
+            before it comes down, so a single foot is in the air at any time """ 
         
-        self.left_back.replant(raised, back_knee, offset, t)
-        self.right_back.replant(raised, back_knee, -offset, t)
-        self.left_middle.replant(raised, middle_knee, -offset, t)
-        self.right_middle.replant(raised, middle_knee, offset, t)
+        timeline = Timeline(self)
+
+        timeline.leg(self.left_back).replant(raised, back_knee, offset, t)
+        timeline.leg(self.right_back, t).replant(raised, back_knee, -offset, t)
+        timeline.leg(self.left_middle, 2 * t).replant(raised, middle_knee, -offset, t)
+        timeline.leg(self.right_middle, 3 * t).replant(raised, middle_knee, offset, t)
         
-        self.left_front.pose(-offset, 0, 0)
-        self.right_front.pose(offset, 0, 0)
+        timeline.leg(self.left_front, 5 * t).pose(-offset, 0, 0).hold(t)
+        timeline.leg(self.right_front, 5 * t).pose(offset, 0, 0).hold(t)
 
-        sleep(t)
+        timeline.play()
 
     def type_stuff(self, up = -40, down = 40, repetitions = 5, t = 0.2):
 
@@ -66,15 +68,17 @@ class HexapodPro(Hexapod):
 
         for r in xrange(repetitions):
 
-            self.left_front.knee.pose(up)
-            self.right_front.knee.pose(down)
-            sleep(t)
+            with self.frame():
+                self.left_front.knee.pose(up)
+                self.right_front.knee.pose(down)
+            self.pause(t)
 
-            self.right_front.knee.pose(up)
-            self.left_front.knee.pose(down)
-            sleep(t)
+            with self.frame():
+                self.right_front.knee.pose(up)
+                self.left_front.knee.pose(down)
+            self.pause(t)
         
-        sleep(t)
+        self.pause(t)
 
     def tilt_left_and_right(self, raised = 60, floor = 20, repetitions = 5, t = 0.15):
         
@@ -106,7 +110,12 @@ class HexapodPro(Hexapod):
     def rock_body(self,  offset = 45, floor = 50, repetitions = 7):
 
         for r in xrange(repetitions):
-            self.uniform_move(self.left_legs, offset, floor, 0)
-            self.uniform_move(self.right_legs, -offset, floor, 0.2)
-            self.uniform_move(self.left_legs, -offset, floor, 0)
-            self.uniform_move(self.right_legs, offset, floor, 0.2)
+            with self.frame():
+                self.uniform_move(self.left_legs, offset, floor)
+                self.uniform_move(self.right_legs, -offset, floor)
+            self.pause(0.2)
+
+            with self.frame():
+                self.uniform_move(self.left_legs, -offset, floor)
+                self.uniform_move(self.right_legs, offset, floor)
+            self.pause(0.2)
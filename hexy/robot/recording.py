@@ -0,0 +1,181 @@
+import mmap
+import struct
+from ..comm import clock
+from scheduler import Scheduler
+
+""" motion file layout, little endian:
+
+    header      - magic 'HEXY', version (uint16), channels n (uint16), PWM frequency (float64)
+    calibration - n x (min pulse, max pulse, max angle, leeway) as (uint16, uint16, int16, int16)
+    frames      - timestamp in seconds from the start (float64), then n x pulse (uint16)
+
+    every frame holds the pulse of every channel, so any frame can be sent on its own """
+
+MAGIC, VERSION = 'HEXY', 1
+
+HEADER = struct.Struct('<4sHHd')
+CALIBRATION = struct.Struct('<HHhh')
+
+
+def frame_struct(channels):
+    return struct.Struct('<d%dH' % channels)
+
+
+class MotionRecording:
+    """ writes every frame a robot sends to path, with its time since the recording started
+
+        with MotionRecording(hexy, 'thriller.hexy'):
+            hexy.thriller()
+
+        timestamps come from the robot's scheduler clock, so a run on a VirtualClock
+        is recorded with the times it would have had in real time """
+
+    def __init__(self, robot, path, freq = None):
+
+        self.state, self.path = robot.state, path
+        self.clock = getattr(robot.scheduler, 'clock', None) or clock.current
+        self.freq = freq or robot.drivers.freq
+        self.frame = frame_struct(len(self.state.pulses))
+        self.file = None
+
+    def __enter__(self):
+
+        self.file = open(self.path, 'wb')
+        write_header(self.file, self.state, self.freq)
+
+        self.pulses = self.state.pulses.tolist()
+        self.output, self.state.output = self.state.output, self.record
+
+        self.start = self.clock.time()
+        self.file.write(self.frame.pack(0.0, *self.pulses))
+
+        return self
+
+    def __exit__(self, *exc):
+
+        self.state.output = self.output
+        self.file.close()
+        self.file = None
+
+    def record(self, pulses):
+
+        for ch, pulse in pulses.iteritems():
+            self.pulses[ch] = pulse
+
+        self.file.write(self.frame.pack(self.clock.time() - self.start, *self.pulses))
+        self.output(pulses)
+
+
+def write_header(f, state, freq):
+
+    f.write(HEADER.pack(MAGIC, VERSION, len(state.pulses), freq))
+
+    for limits in zip(state.min_pulses, state.max_pulses, state.maxes, state.leeways):
+        f.write(CALIBRATION.pack(*limits))
+
+
+def save_compiled(path, state, compiled, freq = 60):
+    """ writes a GaitCompiler result as a motion file, timed by its pauses """
+
+    frame = frame_struct(len(state.pulses))
+    pulses, t = state.pulses.tolist(), compiled.lead
+
+    with open(path, 'wb') as f:
+        write_header(f, state, freq)
+        f.write(frame.pack(0.0, *pulses))
+
+        for changes, delay in compiled.sent():
+            for ch, pulse in changes.iteritems():
+                pulses[ch] = pulse
+
+            f.write(frame.pack(t, *pulses))
+            t += delay
+
+
+class MotionPlayer:
+    """ a memory mapped motion file, frames are unpacked straight from the mapping
+        when they are sent, so a long recording costs no memory up front """
+
+    def __init__(self, path):
+
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+
+        magic, version, self.channels, self.freq = HEADER.unpack_from(self.map, 0)
+
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('%s is not a version %d motion file' % (path, VERSION))
+
+        offset = HEADER.size
+        self.calibration = []
+
+        for ch in xrange(self.channels):
+            self.calibration.append(CALIBRATION.unpack_from(self.map, offset))
+            offset += CALIBRATION.size
+
+        self.frame = frame_struct(self.channels)
+        self.offset = offset
+
+    def __len__(self):
+        return (len(self.map) - self.offset) // self.frame.size
+
+    def __getitem__(self, i):
+        """ (timestamp, pulses) of frame i """
+
+        if not 0 <= i < len(self): raise IndexError(i)
+
+        values = self.frame.unpack_from(self.map, self.offset + i * self.frame.size)
+        return values[0], values[1:]
+
+    def duration(self):
+        return self[len(self) - 1][0] if len(self) else 0.0
+
+    def matches(self, state):
+        """ True when the file was recorded with the calibration of state """
+
+        limits = zip(state.min_pulses, state.max_pulses, state.maxes, state.leeways)
+        return [tuple(c) for c in self.calibration] == limits
+
+    def play(self, drivers, scheduler = None, speed = 1.0, state = None):
+        """ sends every frame to drivers at its timestamp, divided by speed, the first
+            one whole and the others as the channels that changed. with state, the
+            JointState of the robot, it holds the pulses of the last frame afterwards """
+
+        scheduler = scheduler or Scheduler()
+        channels = tuple(xrange(self.channels))
+        unpack, size, offset = self.frame.unpack_from, self.frame.size, self.offset
+        previous, pulses = 0.0, None
+
+        for i in xrange(len(self)):
+            values = unpack(self.map, offset + i * size)
+
+            scheduler.pause((values[0] - previous) / speed)
+            previous = values[0]
+
+            if pulses is None:
+                drivers.write(dict(zip(channels, values[1:])))
+            elif values[1:] != pulses:
+                drivers.write(dict((ch, values[ch + 1]) for ch in channels if values[ch + 1] != pulses[ch]))
+
+            pulses = values[1:]
+
+        if state is not None and pulses is not None: self.adopt(state, pulses)
+
+    def adopt(self, state, pulses):
+        """ sets the pulses of state and the angles closest to them """
+
+        for ch, pulse in enumerate(pulses):
+            state.pulses[ch] = pulse
+            state.angles[ch] = state.angle_of(ch, pulse) if pulse and state.tables[ch] else None
+
+    def close(self):
+        self.map.close()
+
+
+def diff(first, second):
+    """ yields (frame index, channel, first pulse, second pulse) wherever two
+        motion files differ, frame by frame """
+
+    for i in xrange(min(len(first), len(second))):
+        for ch, (a, b) in enumerate(zip(first[i][1], second[i][1])):
+            if a != b: yield i, ch, a, b
@@ -0,0 +1,94 @@
+from math import ceil, sqrt
+from ..comm import clock, trace
+
+
+class Scheduler:
+    """ paces motion on absolute deadlines. pause(t) waits until t seconds after the
+        previous deadline rather than for t seconds, so the time spent writing to the
+        bus since then is taken out of the wait and gaits don't drift.
+
+        period - when set (e.g. 1 / 60. for the 60 Hz PWM), deadlines are rounded up to
+                 whole periods counted from the first deadline, so every flush lands at
+                 the same point of the servo cycle
+        idle   - when a pause comes more than idle seconds after its deadline, the motion
+                 is taken as newly started and the timeline restarts from now
+
+        clock  - where time and waits come from, the current clock of hexy.comm.clock
+                 by default, e.g. a VirtualClock to run routines faster than real time
+
+        while interrupt is set to a threading.Event, setting it cuts the current wait short """
+
+    def __init__(self, period = None, idle = 0.25, clock = None):
+
+        self.period, self.idle, self.clock = period, idle, clock
+        self.origin = self.deadline = None
+        self.interrupt = None
+        self.reset_stats()
+
+    def reset_stats(self):
+
+        self.waits, self.missed = 0, 0
+        self.total_lateness, self.total_square, self.max_lateness = 0.0, 0.0, 0.0
+
+    def source(self):
+        return self.clock or clock.current
+
+    def restart(self, now = None):
+        """ starts a new timeline at now """
+        self.origin = self.deadline = self.source().time() if now is None else now
+
+    def mark(self):
+        """ called when motion is sent, an idle timeline restarts here so the bus time
+            of the first frame is also taken out of the next pause """
+
+        now = self.source().time()
+
+        if self.deadline is None or now - self.deadline > self.idle:
+            self.restart(now)
+
+        return now
+
+    def pause(self, t):
+
+        if t <= 0: return
+
+        now = self.mark()
+
+        deadline = self.deadline + t
+
+        if self.period:
+            periods = ceil((deadline - self.origin) / self.period - 1e-9)
+            deadline = self.origin + periods * self.period
+
+        if deadline > now:
+            source = self.source()
+
+            with trace.span('sleep', 'sleep'):
+                if self.interrupt is None: source.sleep(deadline - now)
+                else: source.wait(self.interrupt, deadline - now)
+
+            lateness = max(source.time() - deadline, 0.0)
+        else:
+            self.missed += 1
+            lateness = now - deadline
+
+        self.deadline = deadline
+        self.record(lateness)
+
+    def record(self, lateness):
+
+        self.waits += 1
+        self.total_lateness += lateness
+        self.total_square += lateness * lateness
+        self.max_lateness = max(self.max_lateness, lateness)
+
+    def stats(self):
+        """ pauses paced, deadlines missed, and the mean, standard deviation and maximum
+            of how late each pause returned, in seconds """
+
+        n = self.waits or 1
+        mean = self.total_lateness / n
+        jitter = sqrt(max(self.total_square / n - mean * mean, 0.0))
+
+        return {'waits': self.waits, 'missed': self.missed,
+                'mean_lateness': mean, 'jitter': jitter, 'max_lateness': self.max_lateness}
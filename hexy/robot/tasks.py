@@ -0,0 +1,240 @@
+import Queue
+import itertools
+import threading
+
+""" non-blocking, cancellable routines. a Motion owns a single thread that runs the
+    routines of one robot in order and is the only writer to its bus, the caller gets
+    a MotionTask back straight away.
+
+    motion = Motion(hexy)
+    task = motion.walk(repetitions = 10)
+    ...
+    task.cancel()       # the walk stops at its next pause and the legs are planted """
+
+
+class Cancelled(Exception):
+    """ raised inside a routine at its next pause after its task was cancelled """
+
+
+def plant(robot, floor = 60):
+    """ the default safe stance, every foot down at floor with the hips left where they are """
+
+    with robot.frame():
+        robot.knee_group.pose(floor)
+        robot.ankle_group.pose(floor - 100)
+
+
+class MotionTask:
+    """ routines queued on or running on a Motion, steps holds (name, args, kwargs)
+        of each, run one after the other """
+
+    def __init__(self, name, steps, priority = 0):
+
+        self.name, self.steps, self.priority = name, steps, priority
+        self.step = None # index of the running step
+        self.value = self.error = None
+        self.stance = True # whether a cancelled run ends in the safe stance
+
+        self.cancel_event = threading.Event() # also wakes the routine from its pause
+        self.done_event = threading.Event()
+        self.lock = threading.Lock()
+        self.callbacks = []
+
+    def cancel(self, stance = True):
+        """ stops the task at its next pause, without the safe stance if stance is False """
+
+        if not stance: self.stance = False
+        self.cancel_event.set()
+
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def done(self):
+        return self.done_event.is_set()
+
+    def wait(self, timeout = None):
+        """ blocks until the task is done or timeout seconds passed, returns done() """
+        return self.done_event.wait(timeout)
+
+    def result(self, timeout = None):
+        """ the routine's return value, raises what it raised, Cancelled included """
+
+        if not self.wait(timeout):
+            raise RuntimeError('%s still running after %s seconds' % (self.name, timeout))
+
+        if self.error is not None: raise self.error
+        return self.value
+
+    def add_done_callback(self, callback):
+        """ calls callback(task) once done, from the motion thread """
+
+        with self.lock:
+            if not self.done():
+                self.callbacks.append(callback)
+                return
+
+        callback(self)
+
+    def check(self):
+        if self.cancelled(): raise Cancelled(self.name)
+
+    def finish(self, value = None, error = None):
+
+        self.value, self.error = value, error
+
+        with self.lock:
+            self.done_event.set()
+            callbacks, self.callbacks = self.callbacks, []
+
+        for callback in callbacks:
+            callback(self)
+
+    def state(self):
+        if self.done(): return 'cancelled' if isinstance(self.error, Cancelled) else 'failed' if self.error else 'done'
+        return 'cancelling' if self.cancelled() else 'pending' if self.step is None else 'running'
+
+    def __repr__(self):
+        return 'task: ' + self.name + ' : ' + self.state()
+
+
+class Checkpoint:
+    """ stands in for the robot's scheduler while a task runs, so that every pause,
+        including pause(0) between frames, is a point where the task can be cancelled """
+
+    def __init__(self, scheduler, task):
+        self.scheduler, self.task = scheduler, task
+
+    def mark(self):
+        return self.scheduler.mark()
+
+    def pause(self, t):
+
+        self.task.check()
+        self.scheduler.pause(t)
+        self.task.check()
+
+    def __getattr__(self, name):
+        return getattr(self.scheduler, name)
+
+
+class Motion:
+    """ runs the routines of robot one after another on a motion thread. any routine
+        can be started by name, motion.walk(...) is motion.start('walk', ...). tasks of
+        a higher priority run first, tasks of the same priority in the order they were
+        started. when a task is cancelled its routine stops at the next pause and
+        stance(robot) runs """
+
+    def __init__(self, robot, stance = plant):
+
+        self.robot, self.stance = robot, stance
+        self.queue = Queue.PriorityQueue()
+        self.order = itertools.count()
+        self.pending = []
+        self.current = None
+        self.lock = threading.Lock()
+
+        self.thread = threading.Thread(target = self.loop, name = 'hexy motion')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def start(self, name, *args, **kwargs):
+        """ queues robot.name(*args, **kwargs) and returns its task """
+        return self.submit([(name, args, kwargs)])
+
+    def submit(self, steps, priority = 0, name = None, preempt = False):
+        """ queues a task running the (name, args, kwargs) steps in order and returns
+            it, with preempt the running task is cancelled if its priority is lower """
+
+        for step, _, _ in steps:
+            if not callable(getattr(self.robot, step, None)):
+                raise AttributeError('%r has no routine %s' % (self.robot, step))
+
+        task = MotionTask(name or '+'.join(step for step, _, _ in steps), list(steps), priority)
+
+        with self.lock:
+            self.pending.append(task)
+            current = self.current
+
+        self.queue.put((-priority, next(self.order), task))
+
+        if preempt and current is not None and current.priority < priority:
+            current.cancel()
+
+        return task
+
+    def tasks(self):
+        """ the running task, if any, then the pending ones in the order they will run """
+
+        with self.lock:
+            pending = sorted(self.pending, key = lambda task: -task.priority)
+            return ([self.current] if self.current else []) + pending
+
+    def __getattr__(self, name):
+
+        if name.startswith('_') or not callable(getattr(self.robot, name, None)):
+            raise AttributeError(name)
+
+        return lambda *args, **kwargs: self.start(name, *args, **kwargs)
+
+    def cancel(self, stance = True):
+        """ cancels the running task and everything queued behind it, with stance False
+            the running task stops where it is, e.g. after an emergency stop """
+
+        with self.lock:
+            tasks = self.pending + [self.current]
+
+        for task in tasks:
+            if task is not None: task.cancel(stance)
+
+    def close(self):
+        """ lets the queued tasks finish, then stops the motion thread """
+
+        self.queue.put((float('inf'), next(self.order), None))
+        self.thread.join()
+
+    def loop(self):
+
+        while True:
+            _, _, task = self.queue.get()
+            if task is None: return
+
+            with self.lock:
+                self.pending.remove(task)
+                self.current = task
+
+            try:
+                self.run(task)
+            finally:
+                with self.lock:
+                    self.current = None
+
+    def run(self, task):
+
+        if task.cancelled():
+            task.finish(error = Cancelled(task.name))
+            return
+
+        state = self.robot.state
+        scheduler = state.scheduler
+
+        state.scheduler = Checkpoint(scheduler, task)
+        scheduler.interrupt = task.cancel_event
+
+        value, error = None, None
+
+        try:
+            for task.step, (name, args, kwargs) in enumerate(task.steps):
+                task.check()
+                value = getattr(self.robot, name)(*args, **kwargs)
+        except Exception, error:
+            value = None
+        finally:
+            state.scheduler, scheduler.interrupt = scheduler, None
+
+        if isinstance(error, Cancelled) and task.stance:
+            try:
+                self.stance(self.robot)
+            except Exception, error: # reported instead of the cancellation
+                pass
+
+        task.finish(value, error)
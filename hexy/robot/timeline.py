@@ -0,0 +1,137 @@
+from ..comm import trace
+
+""" motion as overlapping tracks. each leg, joint or group of joints gets a track of
+    timed keyframes, and play() merges every track into a single stream of frames, so
+    legs move at the same time and each tick is one flush however many move.
+
+    timeline = Timeline(hexy)
+    timeline.leg(hexy.left_back).replant(-30, 0, 45, 0.2)
+    timeline.leg(hexy.right_back, start = 0.2).replant(-30, 0, -45, 0.2)
+    timeline.joint(hexy.neck).pose(30).hold(0.4).pose(0)
+    timeline.play() """
+
+
+class Track(object):
+    """ keyframes of a fixed set of channels, written at a cursor that starts at start
+        seconds and moves on with hold(). a keyframe sets an angle per channel, a None
+        angle leaves that channel where it is """
+
+    def __init__(self, channels, start = 0.0):
+
+        self.channels = tuple(channels)
+        self.time = start
+        self.keys = [] # (time, channel : angle)
+
+    def set(self, angles):
+        """ a keyframe at the cursor from a channel : angle dict """
+
+        self.keys.append((self.time, dict((ch, angle) for ch, angle in angles.iteritems() if angle is not None)))
+        return self
+
+    def pose_each(self, angles):
+        """ a keyframe at the cursor with each channel at its respective angle """
+        return self.set(dict(zip(self.channels, angles)))
+
+    def hold(self, t):
+        """ moves the cursor t seconds on """
+
+        self.time += t
+        return self
+
+
+class JointTrack(Track):
+
+    def __init__(self, joint, start = 0.0):
+        Track.__init__(self, [joint.channel], start)
+
+    def pose(self, angle = 0):
+        return self.pose_each([angle])
+
+
+class GroupTrack(Track):
+    """ joints posed to one angle together, e.g. robot.knees """
+
+    def __init__(self, joints, start = 0.0):
+        Track.__init__(self, [joint.channel for joint in joints], start)
+
+    def pose(self, angle = 0):
+        return self.pose_each([angle] * len(self.channels))
+
+
+class LegTrack(Track):
+    """ the hip, knee and ankle of a leg, with the moves of Leg """
+
+    def __init__(self, leg, start = 0.0):
+        Track.__init__(self, [joint.channel for joint in leg.joints], start)
+
+    def pose(self, hip_angle = 0, knee_angle = 0, ankle_angle = 0):
+        return self.pose_each([hip_angle, knee_angle, ankle_angle])
+
+    def move(self, knee_angle = None, hip_angle = None, offset = 100):
+        """ as Leg.move, a None angle keeps the joint where it is at that time """
+
+        ankle_angle = None if knee_angle is None else knee_angle - offset
+        return self.pose_each([hip_angle, knee_angle, ankle_angle])
+
+    def replant(self, raised, floor, offset, t = 0.1):
+        """ as Leg.replant, the foot goes up, then down at floor with the hip at offset """
+        return self.move(raised).hold(t).move(floor, offset).hold(t)
+
+
+class Timeline(object):
+    """ the tracks of one robot's motion, played as one stream of frames. keyframes at
+        the same time go out in one frame, where two tracks set the same channel the
+        one added later wins """
+
+    def __init__(self, robot):
+        self.robot, self.tracks = robot, []
+
+    def add(self, track):
+
+        self.tracks.append(track)
+        return track
+
+    def leg(self, leg, start = 0.0):
+        return self.add(LegTrack(leg, start))
+
+    def joint(self, joint, start = 0.0):
+        return self.add(JointTrack(joint, start))
+
+    def group(self, joints, start = 0.0):
+        return self.add(GroupTrack(joints, start))
+
+    def duration(self):
+        """ seconds to the end of the longest track, holds included """
+        return max([track.time for track in self.tracks] or [0.0])
+
+    def frames(self):
+        """ the merged keyframes as (time, channels, angles, pulses) in time order,
+            constrained and looked up ahead of playing """
+
+        merged = {}
+
+        for track in self.tracks:
+            for time, angles in track.keys:
+                merged.setdefault(round(time, 6), {}).update(angles)
+
+        state, frames = self.robot.state, []
+
+        for time in sorted(merged):
+            channels = sorted(merged[time])
+            targets = [state.pulse(ch, merged[time][ch]) for ch in channels]
+            frames.append((time, channels, [angle for angle, _ in targets], [pulse for _, pulse in targets]))
+
+        return frames
+
+    def play(self):
+        """ sends each frame at its time and pauses to the end of the timeline """
+
+        state, elapsed = self.robot.state, 0.0
+
+        with trace.span('timeline'):
+            for time, channels, angles, pulses in self.frames():
+                if time > elapsed: self.robot.pause(time - elapsed)
+                state.update(channels, angles, pulses)
+                elapsed = max(elapsed, time)
+
+            if self.duration() > elapsed: self.robot.pause(self.duration() - elapsed)
@@ -0,0 +1,98 @@
+from array import array
+from math import ceil, cos, pi
+from ..comm import trace
+
+""" smooth moves from the current pose to a target pose. the move is planned once, a
+    frame per servo period with every joint eased along the same profile, and played
+    as precomputed pulses, instead of stepping the angles in a Python loop.
+
+    trajectory = Trajectory(hexy.state, {ch: 30 for ch in knees}, 0.5, 'minjerk')
+    trajectory.play(hexy)
+    hexy.glide({ch: 30 for ch in knees}, 0.5)    # the same
+
+    linear   - constant speed, starts and stops at once
+    cosine   - half a cosine, eases in and out
+    minjerk  - the minimum jerk polynomial 10s^3 - 15s^4 + 6s^5, the smoothest start and
+               stop, the least current drawn by all the servos starting together """
+
+PROFILES = {
+    'linear': lambda s: s,
+    'cosine': lambda s: (1 - cos(pi * s)) / 2,
+    'minjerk': lambda s: s * s * s * (10 + s * (6 * s - 15))
+}
+
+# the peak speed of each profile as a multiple of the average speed
+PEAKS = {'linear': 1.0, 'cosine': pi / 2, 'minjerk': 15 / 8.}
+
+samples = {} # (profile, frames) : array of the profile at each frame, 0 excluded
+
+
+def ease(name, frames):
+    """ the fraction of the move done at the end of each of frames frames, computed
+        once per profile and length """
+
+    key = name, frames
+
+    if key not in samples:
+        if name not in PROFILES: raise ValueError('unknown profile ' + name)
+        curve = PROFILES[name]
+        samples[key] = array('d', [curve(float(k) / frames) for k in xrange(1, frames + 1)])
+
+    return samples[key]
+
+
+class Trajectory(object):
+    """ the frames moving the channels of state from their angles to targets, a
+        channel : angle dict, over duration seconds at rate frames per second.
+
+        duration is stretched so that no joint goes faster than its JointState.speeds
+        limit at the profile's peak, every joint then takes the whole duration. a joint
+        that is off has no angle to start from and goes to its target in the first frame """
+
+    def __init__(self, state, targets, duration, profile = 'minjerk', rate = 60):
+
+        if profile not in PEAKS: raise ValueError('unknown profile ' + profile)
+
+        self.state, self.rate = state, rate
+        self.channels = sorted(targets)
+
+        starts = [state.angles[ch] for ch in self.channels]
+        ends = [state.pulse(ch, targets[ch]) for ch in self.channels]
+
+        peak = PEAKS[profile]
+
+        for ch, start, (end, _) in zip(self.channels, starts, ends):
+            if start is not None:
+                duration = max(duration, abs(end - start) * peak / state.speeds[ch])
+
+        self.duration = duration
+        self.frames = self.plan(starts, ends, ease(profile, max(1, int(ceil(duration * rate - 1e-9)))))
+
+    def plan(self, starts, ends, curve):
+        """ (angles, pulses) per frame, whole degrees looked up in the tables on the way
+            and the exact targets in the last frame """
+
+        tables, reaches = self.state.tables, [self.state.reach(ch) for ch in self.channels]
+        frames = []
+
+        for s in curve[:-1]:
+            angles = [end if start is None else int(round(start + (end - start) * s))
+                      for start, (end, _) in zip(starts, ends)]
+
+            pulses = [pulse if angle == end else tables[ch][angle + reach]
+                      for ch, angle, reach, (end, pulse) in zip(self.channels, angles, reaches, ends)]
+
+            frames.append((angles, pulses))
+
+        frames.append(([end for end, _ in ends], [pulse for _, pulse in ends]))
+        return frames
+
+    def play(self, robot):
+        """ sends a frame every 1 / rate seconds """
+
+        t = 1.0 / self.rate
+
+        with trace.span('trajectory'):
+            for angles, pulses in self.frames:
+                self.state.update(self.channels, angles, pulses)
+                robot.pause(t)
@@ -0,0 +1,411 @@
+""" remote control over UDP. an operator streams small datagrams, each carrying one
+    command and a sequence number, and the robot applies the newest command once per
+    control tick, so a burst of packets costs one flush and a late packet is never
+    applied after a newer one. when no packet arrives for timeout seconds the robot
+    stops walking and plants its feet.
+
+    sudo python -m hexy.teleop serve --port 9750 &
+
+    client = TeleopClient(('hexy.local', 9750))
+    client.velocity(forward = 40, yaw = 10)     # mm/s and degrees/s, walks with a Gait
+    client.pose(dz = 10)                        # raises the body 10 mm while standing or walking
+    client.angles({'N': 30, 'LFK': -20})        # joints by key or channel, in degrees
+    client.pulses({18: 400})                    # raw pulses, 0 turns the channel off
+
+    python -m hexy.teleop loopback             # measures a client and server on one host
+
+    a datagram is a header, magic 'HX', version, kind and sequence number (2s B B I),
+    followed by the payload in network byte order:
+
+    PULSES   - a 32 bit mask of the joint_properties channels set, then each of their
+               pulses as an unsigned short, in channel order
+    ANGLES   - the same mask, then each angle in tenths of a degree as a signed short
+    VELOCITY - forward, sideways (mm/s) and yaw (degrees/s) as three floats
+    POSE     - the body offset dx, dy, dz (mm) from the gait's stance as three floats
+
+    vectors that aren't finite or exceed LIMITS are malformed, as is a command the
+    robot can't take
+
+    sequence numbers are compared modulo 2 ** 32, so they may wrap. after a timeout the
+    last one is forgotten and a restarted client is heard again from any number """
+
+import argparse
+import math
+import socket
+import struct
+import sys
+import threading
+from .comm import clock
+
+PORT = 9750
+MAGIC, VERSION = 'HX', 1
+PULSES, ANGLES, VELOCITY, POSE = 1, 2, 3, 4
+
+HEADER = struct.Struct('!2sBBI')
+MASK = struct.Struct('!I')
+VECTOR = struct.Struct('!fff')
+
+# the largest magnitude of each component of a vector command
+LIMITS = {VELOCITY: (1000.0, 1000.0, 720.0), POSE: (100.0, 100.0, 100.0)}
+
+
+class Malformed(ValueError):
+    """ raised for a datagram that isn't a teleop command """
+
+
+def encode(kind, seq, values):
+    """ one datagram, values a {channel: target} dict for PULSES and ANGLES and an
+        (x, y, z) triple for VELOCITY and POSE """
+
+    header = HEADER.pack(MAGIC, VERSION, kind, seq & 0xFFFFFFFF)
+
+    if kind in (VELOCITY, POSE):
+        return header + VECTOR.pack(*values)
+
+    channels = sorted(values)
+    mask = sum(1 << ch for ch in channels)
+
+    if kind == PULSES:
+        targets = [int(values[ch]) for ch in channels]
+        return header + MASK.pack(mask) + struct.pack('!%dH' % len(channels), *targets)
+
+    if kind == ANGLES:
+        targets = [int(round(values[ch] * 10)) for ch in channels]
+        return header + MASK.pack(mask) + struct.pack('!%dh' % len(channels), *targets)
+
+    raise ValueError('unknown kind %r' % kind)
+
+
+def decode(datagram):
+    """ returns (seq, kind, values) of a datagram, raises Malformed """
+
+    if len(datagram) < HEADER.size: raise Malformed('short datagram')
+
+    magic, version, kind, seq = HEADER.unpack_from(datagram)
+    if magic != MAGIC or version != VERSION: raise Malformed('not a teleop datagram')
+
+    payload = datagram[HEADER.size:]
+
+    try:
+        if kind in (VELOCITY, POSE):
+            values = VECTOR.unpack(payload)
+
+            for value, limit in zip(values, LIMITS[kind]):
+                if math.isnan(value) or abs(value) > limit: raise Malformed('vector out of range')
+
+            return seq, kind, values
+
+        if kind in (PULSES, ANGLES):
+            mask, = MASK.unpack_from(payload)
+            channels = [ch for ch in xrange(32) if mask >> ch & 1]
+            targets = struct.unpack('!%d%s' % (len(channels), 'H' if kind == PULSES else 'h'),
+                                    payload[MASK.size:])
+
+            if kind == ANGLES: targets = [target / 10.0 for target in targets]
+            return seq, kind, dict(zip(channels, targets))
+
+    except struct.error, error:
+        raise Malformed(str(error))
+
+    raise Malformed('unknown kind %d' % kind)
+
+
+def newer(seq, last):
+    """ whether seq comes after last in sequence number arithmetic """
+    return last is None or 0 < (seq - last) & 0xFFFFFFFF < 0x80000000
+
+
+class TeleopServer:
+    """ receives commands for robot on a UDP socket bound to address and applies them
+        at rate ticks per second. velocity and pose commands steer gait, a gait.Gait
+        made with the robot's defaults unless given, joint commands pose the joints
+        directly and stop the gait. after timeout seconds without a packet the robot
+        stands in stance(robot), tasks.plant by default.
+
+        the socket is read on its own thread and only the newest command is kept, the
+        control loop runs on the caller's thread, e.g. as a Motion routine """
+
+    def __init__(self, robot, address = ('127.0.0.1', PORT), rate = 60, timeout = 0.25, gait = None,
+                 stance = None):
+
+        from .robot.gait import Gait
+        from .robot.tasks import plant
+
+        self.robot, self.state = robot, robot.state
+        self.rate, self.timeout = rate, timeout
+        self.gait = gait or Gait(robot, rate = rate)
+        self.stance = stance or plant
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(address)
+        self.socket.settimeout(0.1)
+        self.address = self.socket.getsockname()
+
+        self.lock = threading.Lock()
+        self.latest = None # (received, seq, kind, values) of the newest unapplied command
+        self.last = None # sequence number of the newest command received
+        self.heard = None # when it was received, None while standing after a timeout
+        self.walking = False
+
+        self.received = self.applied = self.stale = self.superseded = 0
+        self.malformed = self.timeouts = self.failed = 0
+        self.total_latency, self.max_latency = 0.0, 0.0
+
+        self.running = False
+        self.receiver = None
+
+    def start(self):
+        """ starts reading the socket, returns self """
+
+        self.running = True
+        self.receiver = threading.Thread(target = self.receive, name = 'hexy teleop')
+        self.receiver.daemon = True
+        self.receiver.start()
+        return self
+
+    def receive(self):
+
+        while self.running:
+            try:
+                datagram = self.socket.recv(512)
+            except socket.timeout:
+                continue
+            except socket.error:
+                return
+
+            try:
+                seq, kind, values = decode(datagram)
+            except Malformed:
+                self.malformed += 1
+                continue
+
+            with self.lock:
+                self.received += 1
+
+                if not newer(seq, self.last):
+                    self.stale += 1
+                    continue
+
+                if self.latest is not None: self.superseded += 1
+                self.latest, self.last, self.heard = (clock.now(), seq, kind, values), seq, clock.now()
+
+    def take(self):
+        """ the newest command since the last tick, if any, and whether the operator
+            went quiet for longer than timeout """
+
+        with self.lock:
+            command, self.latest = self.latest, None
+            lost = command is None and self.heard is not None and clock.now() - self.heard > self.timeout
+
+            if lost: self.last = self.heard = None
+
+        return command, lost
+
+    def apply(self, kind, values):
+
+        if kind == VELOCITY:
+            self.gait.command(*values)
+            self.walking = True
+
+        elif kind == POSE:
+            self.gait.shift(*values)
+            self.walking = True
+
+        else:
+            self.halt()
+
+            channels = [ch for ch in sorted(values) if ch < len(self.state.tables) and self.state.tables[ch]]
+
+            if kind == ANGLES:
+                targets = [self.state.pulse(ch, values[ch]) for ch in channels]
+            else:
+                targets = [(None, 0) if not values[ch] else self.clamp(ch, values[ch]) for ch in channels]
+
+            self.state.update(channels, [angle for angle, _ in targets], [pulse for _, pulse in targets])
+
+    def clamp(self, ch, pulse):
+        """ the pulse held to the table of the channel, the same range posing reaches
+            including the joint's leeway """
+
+        table = self.state.tables[ch]
+        pulse = max(min(table[0], table[-1]), min(max(table[0], table[-1]), pulse))
+        return self.state.angle_of(ch, pulse), pulse
+
+    def halt(self):
+        """ stops the gait where it is, it starts from rest on the next velocity command """
+
+        self.walking = False
+        self.gait.command()
+        self.gait.velocity = (0.0, 0.0, 0.0)
+
+    def tick(self):
+        """ applies the newest command, or the safe stance after a timeout, and advances
+            the gait, all in one frame """
+
+        command, lost = self.take()
+
+        try:
+            with self.robot.frame():
+                if command is not None:
+                    received, _, kind, values = command
+                    self.apply(kind, values)
+
+                elif lost:
+                    self.timeouts += 1
+                    self.halt()
+                    self.stance(self.robot)
+
+                if self.walking: self.gait.tick()
+
+        except Exception, error:
+            from .robot.core import Stopped
+            if isinstance(error, Stopped): raise
+
+            # a command the gait can't follow stops it and stands, the server keeps going
+            self.failed += 1
+            self.halt()
+            self.gait.shift()
+            self.stance(self.robot)
+            return
+
+        if command is not None:
+            latency = clock.now() - received
+            self.applied += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def run(self, duration = None):
+        """ ticks until duration seconds passed or close() """
+
+        if self.receiver is None: self.start()
+        t, elapsed = 1.0 / self.rate, 0.0
+
+        while self.running and (duration is None or elapsed < duration):
+            self.tick()
+            self.robot.pause(t)
+            elapsed += t
+
+    def close(self):
+
+        self.running = False
+        if self.receiver is not None: self.receiver.join()
+        self.socket.close()
+
+    def stats(self):
+        """ packets received, applied, dropped as stale or superseded within a tick, not
+            decoded, timeouts, ticks that failed and stood, and the mean and maximum seconds from receipt to flush """
+
+        return {'received': self.received, 'applied': self.applied, 'stale': self.stale,
+                'superseded': self.superseded, 'malformed': self.malformed, 'timeouts': self.timeouts,
+                'failed': self.failed,
+                'mean_latency': self.total_latency / (self.applied or 1), 'max_latency': self.max_latency}
+
+
+class TeleopClient:
+    """ sends commands to a TeleopServer at address, numbering them in order """
+
+    def __init__(self, address = ('127.0.0.1', PORT), seq = 0):
+
+        from .robot.core import joint_properties
+
+        self.address, self.seq = address, seq
+        self.channels = dict((key, ch) for key, (ch, _, _) in joint_properties.iteritems())
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send(self, kind, values):
+
+        self.socket.sendto(encode(kind, self.seq, values), self.address)
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+
+    def targets(self, values):
+        return dict((self.channels.get(joint, joint), target) for joint, target in values.iteritems())
+
+    def pulses(self, values):
+        """ pulses by joint key ('LFH') or channel, 0 turns a channel off """
+        self.send(PULSES, self.targets(values))
+
+    def angles(self, values):
+        """ angles in degrees by joint key or channel """
+        self.send(ANGLES, self.targets(values))
+
+    def velocity(self, forward = 0.0, sideways = 0.0, yaw = 0.0):
+        self.send(VELOCITY, (forward, sideways, yaw))
+
+    def pose(self, dx = 0.0, dy = 0.0, dz = 0.0):
+        self.send(POSE, (dx, dy, dz))
+
+    def close(self):
+        self.socket.close()
+
+
+def loopback(duration = 2.0, rate = 60, send_rate = 250):
+    """ runs a server on the simulated bus and a client streaming to it over the
+        loopback interface, returns the server's stats """
+
+    import time
+    from .comm.sim import SimulatedBus
+    from .robot.dancing import DancingHexapod
+
+    SimulatedBus().install()
+
+    robot = DancingHexapod()
+    robot.default()
+
+    server = TeleopServer(robot, ('127.0.0.1', 0), rate = rate).start()
+    client = TeleopClient(server.address)
+
+    def operate():
+
+        for k in xrange(int(duration * send_rate)):
+            if k % 50 == 49: client.angles({'N': k % 90 - 45})
+            else: client.velocity(forward = 30, yaw = 10 if k % 100 < 50 else -10)
+            time.sleep(1.0 / send_rate)
+
+    operator = threading.Thread(target = operate)
+    operator.start()
+
+    server.run(duration + 2 * server.timeout)
+    operator.join()
+
+    server.close()
+    client.close()
+
+    return server.stats()
+
+
+def main(argv = None):
+
+    parser = argparse.ArgumentParser(description = 'hexy teleoperation server')
+    parser.add_argument('command', choices = ['serve', 'loopback'])
+    parser.add_argument('--host', default = '0.0.0.0')
+    parser.add_argument('--port', type = int, default = PORT)
+    parser.add_argument('--rate', type = int, default = 60, help = 'control ticks per second')
+    parser.add_argument('--timeout', type = float, default = 0.25, help = 'seconds without a packet before standing')
+    parser.add_argument('--duration', type = float, default = 2.0, help = 'seconds to stream in loopback')
+    args = parser.parse_args(argv)
+
+    if args.command == 'loopback':
+        for name, value in sorted(loopback(args.duration, args.rate).iteritems()):
+            print '%-14s %s' % (name, value)
+        return 0
+
+    from .robot.core import Drivers
+    from .robot.dancing import DancingHexapod
+    from .robot.scheduler import Scheduler
+
+    drivers = Drivers(warm = True)
+    drivers.arm()
+
+    robot = DancingHexapod(drivers = drivers, scheduler = Scheduler(period = 1.0 / args.rate))
+    server = TeleopServer(robot, (args.host, args.port), args.rate, args.timeout)
+
+    try:
+        server.run()
+    finally:
+        server.close()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
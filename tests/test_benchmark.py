@@ -0,0 +1,46 @@
+import unittest
+
+from hexy import benchmark
+from hexy.comm import clock
+from hexy.comm.i2c import Adafruit_I2C, openSMBus
+from hexy.comm.sim import SimulatedBus
+
+
+class BenchmarkTest(unittest.TestCase):
+    """ the benchmark runs on its own bus and clock and leaves those in use alone """
+
+    ROUTINES = ['squat', 'wave']
+
+    def tearDown(self):
+
+        SimulatedBus.installed.clear()
+        Adafruit_I2C.setBusFactory(None)
+
+    def test_runs_are_repeatable(self):
+
+        first = benchmark.run(self.ROUTINES)
+        second = benchmark.run(self.ROUTINES)
+
+        for name in self.ROUTINES:
+            self.assertGreater(first[name]['transactions'], 0)
+
+            for metric in ('transactions', 'bytes', 'frames'):
+                self.assertEqual(first[name][metric], second[name][metric])
+
+    def test_the_previous_bus_and_clock_are_restored(self):
+
+        previous = clock.current
+        benchmark.run(['squat'])
+
+        self.assertIs(clock.current, previous)
+        self.assertIs(Adafruit_I2C.busFactory, openSMBus)
+        self.assertEqual(SimulatedBus.installed, {})
+
+        bus = SimulatedBus().install()
+        benchmark.run(['squat'])
+
+        self.assertEqual(SimulatedBus.installed, {None: bus})
+
+
+if __name__ == '__main__':
+    unittest.main()
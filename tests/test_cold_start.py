@@ -0,0 +1,64 @@
+import unittest
+
+from hexy.comm.i2c import Adafruit_I2C
+from hexy.comm.pwm import PWM
+from hexy.comm.sim import SimulatedBus
+
+
+class ColdStartTest(unittest.TestCase):
+    """ a PWM that isn't warm clears whatever a chip was left putting out """
+
+    SLEEP = 0x10
+
+    def setUp(self):
+
+        self.bus = SimulatedBus().install()
+        self.device = self.bus.devices[0x40]
+        PWM.allcall_i2c = {}
+
+    def tearDown(self):
+
+        SimulatedBus.installed.clear()
+        Adafruit_I2C.setBusFactory(None)
+        PWM.allcall_i2c = {}
+
+    def leave(self, mode1, pulse):
+        """ the chip as a previous program left it, channel 0 set to pulse """
+
+        self.device.registers[0] = mode1
+        self.device.registers[6:10] = [0, 0, pulse & 0xFF, pulse >> 8]
+
+    def test_a_chip_awake_without_auto_increment_is_cleared(self):
+
+        # as the stock Adafruit driver leaves a chip: awake, ALLCALL, no AI
+        self.leave(0x01, 300)
+        driver = PWM(0x40)
+
+        self.assertEqual(driver.cachedPWM()[0], (0, 0))
+        self.assertEqual(driver.shadow, self.device.registers[6:70])
+
+    def test_a_powered_on_chip_is_mirrored(self):
+        self.assertEqual(PWM(0x40).shadow, self.device.registers[6:70])
+
+    def test_a_sleeping_chip_wakes_only_once_cleared(self):
+
+        self.leave(0x01 | self.SLEEP, 300)
+        awake_with_pulse = []
+        write = self.device.write
+
+        def watched(reg, data):
+            write(reg, data)
+            registers = self.device.registers
+            if not registers[0] & self.SLEEP and registers[8] | registers[9] << 8:
+                awake_with_pulse.append(reg)
+
+        self.device.write = watched
+        driver = PWM(0x40)
+
+        self.assertEqual(awake_with_pulse, [])
+        self.assertFalse(self.device.registers[0] & self.SLEEP)
+        self.assertEqual(driver.cachedPWM()[0], (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
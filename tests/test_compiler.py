@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from hexy.comm import clock
+from hexy.comm.i2c import Adafruit_I2C
+from hexy.comm.pwm import PWM
+from hexy.comm.sim import SimulatedBus
+from hexy.robot.compiler import GaitCompiler
+from hexy.robot.core import Drivers
+from hexy.robot.dancing import DancingHexapod
+
+
+class CompilerTest(unittest.TestCase):
+    """ compiled routines replayed against the live runs they were recorded from, each
+        robot on a simulated bus of its own and a virtual clock """
+
+    ROUTINES = [('lie_down', (), {}), ('get_up', (), {}), ('squat', (40,), {}), ('wave', (), {'repetitions': 1})]
+
+    def setUp(self):
+
+        self.previous = clock.current
+        clock.VirtualClock().install()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        self.previous.install()
+        shutil.rmtree(self.directory)
+
+        SimulatedBus.installed.clear()
+        Adafruit_I2C.setBusFactory(None)
+        PWM.allcall_i2c = {}
+
+    def robot(self):
+        """ a default posed robot on a fresh bus, the frames it sends and its bus """
+
+        bus = SimulatedBus().install()
+        PWM.allcall_i2c = {}
+
+        robot = DancingHexapod(drivers = Drivers())
+        robot.default()
+
+        frames, output = [], robot.state.output
+
+        def sent(pulses):
+            frames.append((dict(pulses), clock.now()))
+            output(pulses)
+
+        robot.state.output = sent
+        return robot, frames, bus
+
+    def live(self):
+
+        robot, frames, bus = self.robot()
+
+        for name, args, kwargs in self.ROUTINES:
+            getattr(robot, name)(*args, **kwargs)
+
+        return robot, frames, bus
+
+    def compiled(self, directory = None):
+
+        robot, frames, bus = self.robot()
+        compiler = GaitCompiler(robot, directory = directory)
+
+        for name, args, kwargs in self.ROUTINES:
+            compiler.run(name, *args, **kwargs)
+
+        return robot, frames, bus, compiler
+
+    def assertSame(self, first, second):
+
+        (robot, frames, bus), (other, other_frames, other_bus) = first, second
+
+        self.assertEqual([pulses for pulses, _ in frames], [pulses for pulses, _ in other_frames])
+        self.assertEqual([round(t - frames[0][1], 4) for _, t in frames],
+                         [round(t - other_frames[0][1], 4) for _, t in other_frames])
+        self.assertEqual(robot.state.angles, other.state.angles)
+        self.assertEqual(robot.state.pulses, other.state.pulses)
+
+        for address in bus.devices:
+            self.assertEqual(bus.devices[address].registers, other_bus.devices[address].registers)
+
+    def test_a_compiled_replay_matches_the_live_run(self):
+
+        robot, frames, bus, compiler = self.compiled()
+
+        self.assertEqual(compiler.misses, len(self.ROUTINES))
+        self.assertSame(self.live(), (robot, frames, bus))
+
+    def test_a_routine_loaded_from_disk_matches_the_live_run(self):
+
+        self.compiled(directory = self.directory)
+        robot, frames, bus, compiler = self.compiled(directory = self.directory)
+
+        self.assertEqual((compiler.misses, compiler.loads), (0, len(self.ROUTINES)))
+        self.assertSame(self.live(), (robot, frames, bus))
+
+    def test_unreadable_files_are_misses(self):
+
+        self.compiled(directory = self.directory)
+
+        for name in os.listdir(self.directory):
+            with open(os.path.join(self.directory, name), 'r+b') as f:
+                f.truncate(10)
+
+        robot, frames, bus, compiler = self.compiled(directory = self.directory)
+
+        self.assertEqual((compiler.misses, compiler.loads), (len(self.ROUTINES), 0))
+        self.assertSame(self.live(), (robot, frames, bus))
+
+    def test_a_failing_save_still_moves_the_robot(self):
+
+        self.compiled(directory = self.directory)
+
+        # directories where the files go, nothing can be read from or renamed onto them
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            os.remove(path)
+            os.mkdir(path)
+
+        robot, frames, bus, compiler = self.compiled(directory = self.directory)
+
+        self.assertEqual(compiler.misses, len(self.ROUTINES))
+        self.assertTrue(all(os.path.isdir(os.path.join(self.directory, name)) for name in os.listdir(self.directory)))
+        self.assertSame(self.live(), (robot, frames, bus))
+
+
+if __name__ == '__main__':
+    unittest.main()
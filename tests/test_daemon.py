@@ -0,0 +1,62 @@
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import unittest
+
+from hexy import daemon
+
+
+class Echo(object):
+    """ stands in for a Daemon, answering every request """
+
+    def handle(self, request):
+        return {'ok': True, 'op': request.get('op')}
+
+
+class ServerTest(unittest.TestCase):
+    """ the socket a daemon serves on """
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'hexy.sock')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def serving(self, **kwargs):
+
+        server = daemon.Server(Echo(), self.path, **kwargs)
+        thread = threading.Thread(target = server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def test_the_socket_is_open_to_its_group(self):
+
+        self.serving()
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0660)
+        self.assertEqual(daemon.request({'op': 'status'}, self.path), {'ok': True, 'op': 'status'})
+
+    def test_a_running_daemon_keeps_its_socket(self):
+
+        self.serving()
+        self.assertRaises(IOError, daemon.Server, Echo(), self.path)
+        self.assertTrue(daemon.request({'op': 'status'}, self.path)['ok'])
+
+    def test_a_stale_socket_is_replaced(self):
+
+        server = daemon.Server(Echo(), self.path)
+        server.socket.close() # gone without removing its socket
+
+        self.serving(mode = 0600)
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0600)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from hexy.comm.i2c import Adafruit_I2C
+from hexy.comm.i2cdev import I2CDevBus
+from hexy.comm.pwm import PWM
+from hexy.comm.sim import SimulatedBus
+
+
+class I2CDevTest(unittest.TestCase):
+    """ I2CDevBus on a stand-in device file, its ioctls served by a simulated bus """
+
+    def setUp(self):
+
+        handle, self.path = tempfile.mkstemp(prefix = 'i2c-')
+        os.close(handle)
+
+        self.bus = SimulatedBus()
+        self.calls = [] # the messages of each ioctl as (address, length)
+        self.during = None # called with each ioctl before the bus serves it
+
+        self.device = I2CDevBus(1, path = self.path, ioctl = self.ioctl)
+        Adafruit_I2C.setBusFactory(lambda busnum: self.device)
+        PWM.allcall_i2c = {}
+
+    def tearDown(self):
+
+        self.device.close()
+        os.remove(self.path)
+
+        Adafruit_I2C.setBusFactory(None)
+        PWM.allcall_i2c = {}
+
+    def ioctl(self, fd, request, arg):
+
+        self.calls.append([(arg.msgs[i].addr, arg.msgs[i].len) for i in xrange(arg.nmsgs)])
+        if self.during is not None: self.during(arg)
+        self.bus.ioctl(fd, request, arg)
+
+    def test_a_whole_chip_is_one_message(self):
+
+        driver = PWM(0x40)
+        del self.calls[:]
+
+        driver.setPWMs(dict((ch, (0, 200 + ch)) for ch in xrange(16)))
+
+        self.assertEqual(self.calls, [[(0x40, 65)]])
+        self.assertEqual(driver.shadow, self.bus.devices[0x40].registers[6:70])
+
+    def test_the_plan_bridges_a_single_unchanged_channel(self):
+
+        driver = PWM(0x40)
+        driver.setPWMs({2: (0, 300)})
+
+        plan = driver.planPWMs({0: (0, 100), 1: (0, 100), 2: (0, 300), 3: (0, 100)})
+        self.assertEqual([(reg, len(data)) for reg, data in plan], [(6, 16)])
+
+    def test_the_plan_splits_at_two_unchanged_channels(self):
+
+        driver = PWM(0x40)
+        driver.setPWMs({2: (0, 300), 3: (0, 300)})
+
+        plan = driver.planPWMs({0: (0, 100), 2: (0, 300), 3: (0, 300), 4: (0, 100)})
+        self.assertEqual([(reg, len(data)) for reg, data in plan], [(6, 4), (22, 4)])
+
+    def test_concurrent_transfers_keep_their_own_buffers(self):
+
+        block = [0x55] * 64
+        waiting = []
+
+        for chip in self.bus.devices.itervalues():
+            chip.registers[0] |= 0x20 # auto-increment, for the block writes to land whole
+
+        def interfere(arg):
+            if arg.msgs[0].len != 65: return
+            self.during = None
+
+            # another block transfer waits for this one to go out
+            other = threading.Thread(target = self.device.write_i2c_block_data, args = (0x41, 6, [0xAA] * 64))
+            other.start()
+            other.join(0.05)
+            waiting.append(other.is_alive())
+
+            # a single register write goes out at once, from a buffer of its own
+            self.device.write_byte_data(0x41, 0x01, 0x0C) # MODE2
+            self.assertEqual(arg.msgs[0].buf[:65], [6] + block)
+            self.other = other
+
+        self.during = interfere
+        self.device.write_i2c_block_data(0x40, 6, block)
+        self.other.join()
+
+        self.assertEqual(waiting, [True])
+        self.assertEqual(self.bus.devices[0x40].registers[6:70], block)
+        self.assertEqual(self.bus.devices[0x41].registers[6:70], [0xAA] * 64)
+        self.assertEqual(self.bus.devices[0x41].registers[1], 0x0C)
+
+
+if __name__ == '__main__':
+    unittest.main()
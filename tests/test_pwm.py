@@ -0,0 +1,66 @@
+import random
+import unittest
+
+from hexy.comm.i2c import Adafruit_I2C
+from hexy.comm.pwm import PWM
+from hexy.comm.sim import SimulatedBus
+
+
+class ShadowTest(unittest.TestCase):
+    """ the LED register shadow of PWM against the simulated chip it mirrors """
+
+    def setUp(self):
+
+        self.bus = SimulatedBus().install()
+        self.device = self.bus.devices[0x40]
+        PWM.allcall_i2c = {}
+
+    def tearDown(self):
+
+        SimulatedBus.installed.clear()
+        Adafruit_I2C.setBusFactory(None)
+        PWM.allcall_i2c = {}
+
+    def assertMirrored(self, driver):
+        self.assertEqual(driver.shadow, self.device.registers[6:70])
+
+    def test_shadow_follows_every_write(self):
+
+        driver, rng = PWM(0x40), random.Random(3)
+
+        for _ in xrange(200):
+            channels = rng.sample(xrange(16), rng.randint(1, 16))
+            driver.setPWMs(dict((ch, (0, rng.choice([150, 300, 450]))) for ch in channels))
+            self.assertMirrored(driver)
+
+            if rng.random() < 0.1:
+                driver.setAllPWM(0, rng.choice([0, 300]))
+                self.assertMirrored(driver)
+
+    def test_unchanged_channels_are_not_written(self):
+
+        driver = PWM(0x40)
+        driver.setPWMs({0: (0, 300), 1: (0, 300)})
+        self.bus.clear()
+
+        driver.setPWMs({0: (0, 300), 1: (0, 300)})
+        driver.setAllPWM(0, 0)
+        driver.setAllPWM(0, 0)
+
+        self.assertEqual(len(self.bus.transactions), 1)
+        self.assertMirrored(driver)
+
+    def test_broadcast_marks_every_chip(self):
+
+        first, second = PWM(0x40), PWM(0x41)
+
+        PWM.broadcastAllPWM(0, 250)
+        for driver in (first, second):
+            driver.assumeAllPWM(0, 250)
+
+        self.assertMirrored(first)
+        self.assertEqual(second.shadow, self.bus.devices[0x41].registers[6:70])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+
+from hexy.comm import clock
+from hexy.comm.i2c import Adafruit_I2C
+from hexy.comm.pwm import PWM
+from hexy.comm.sim import SimulatedBus
+from hexy.robot.core import Drivers
+from hexy.robot.dancing import DancingHexapod
+from hexy.robot.recording import MotionPlayer, MotionRecording
+
+
+class RecordingTest(unittest.TestCase):
+    """ a routine recorded on one simulated robot and replayed on another, on a
+        virtual clock """
+
+    def setUp(self):
+
+        self.previous, self.clock = clock.current, clock.VirtualClock().install()
+        handle, self.path = tempfile.mkstemp(suffix = '.hexy')
+        os.close(handle)
+
+    def tearDown(self):
+
+        self.previous.install()
+        os.remove(self.path)
+
+        SimulatedBus.installed.clear()
+        Adafruit_I2C.setBusFactory(None)
+        PWM.allcall_i2c = {}
+
+    def robot(self):
+
+        bus = SimulatedBus().install()
+        PWM.allcall_i2c = {}
+
+        robot = DancingHexapod(drivers = Drivers())
+        robot.default()
+        return robot, bus
+
+    def test_a_replay_ends_where_the_recording_did(self):
+
+        robot, bus = self.robot()
+
+        with MotionRecording(robot, self.path):
+            robot.wave(repetitions = 1)
+            robot.squat(40)
+
+        other, other_bus = self.robot()
+        other.squat(10) # somewhere else, the first frame puts every channel back
+
+        writes, write = [], other.drivers.write
+        other.drivers.write = lambda pulses: (writes.append(sorted(pulses)), write(pulses))
+
+        player = MotionPlayer(self.path)
+        self.addCleanup(player.close)
+        self.assertTrue(player.matches(other.state))
+
+        start = self.clock.time()
+        player.play(other.drivers, other.scheduler, state = other.state)
+
+        self.assertAlmostEqual(self.clock.time() - start, player.duration())
+        self.assertEqual(writes[0], range(len(other.state.pulses)))
+        self.assertTrue(all(len(channels) < len(writes[0]) for channels in writes[1:]))
+
+        self.assertEqual(other.state.pulses, robot.state.pulses)
+        self.assertEqual(other.state.angles, robot.state.angles)
+
+        for address in bus.devices:
+            self.assertEqual(other_bus.devices[address].registers, bus.devices[address].registers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+
+from hexy.comm.clock import VirtualClock
+from hexy.robot.scheduler import Scheduler
+
+
+class SchedulerTest(unittest.TestCase):
+    """ pause deadlines on a VirtualClock, where time only moves when told to """
+
+    def setUp(self):
+        self.clock = VirtualClock()
+
+    def test_work_between_pauses_is_taken_out_of_the_wait(self):
+
+        scheduler = Scheduler(clock = self.clock)
+        scheduler.mark()
+
+        for k in xrange(1, 6):
+            self.clock.advance(0.03) # the bus time of a frame
+            scheduler.pause(0.1)
+            self.assertAlmostEqual(self.clock.time(), 0.1 * k)
+
+        self.assertAlmostEqual(self.clock.slept, 5 * 0.07)
+        self.assertEqual(scheduler.missed, 0)
+
+    def test_deadlines_round_up_to_whole_periods(self):
+
+        scheduler = Scheduler(period = 1 / 60., clock = self.clock)
+        scheduler.mark()
+
+        scheduler.pause(0.02)
+        self.assertAlmostEqual(self.clock.time(), 2 / 60.)
+
+        scheduler.pause(1 / 60.)
+        self.assertAlmostEqual(self.clock.time(), 3 / 60.)
+
+    def test_a_late_pause_counts_as_missed_and_does_not_wait(self):
+
+        scheduler = Scheduler(clock = self.clock)
+        scheduler.mark()
+
+        self.clock.advance(0.15)
+        scheduler.pause(0.1)
+
+        self.assertEqual(scheduler.missed, 1)
+        self.assertEqual(self.clock.sleeps, 0)
+        self.assertAlmostEqual(scheduler.stats()['max_lateness'], 0.05)
+
+    def test_an_idle_timeline_restarts(self):
+
+        scheduler = Scheduler(idle = 0.25, clock = self.clock)
+        scheduler.mark()
+
+        self.clock.advance(1.0)
+        scheduler.pause(0.1)
+
+        self.assertAlmostEqual(self.clock.time(), 1.1)
+        self.assertEqual(scheduler.missed, 0)
+
+    def test_an_interrupt_cuts_the_wait_short(self):
+
+        class Set(object):
+            def is_set(self): return True
+
+        scheduler = Scheduler(clock = self.clock)
+        scheduler.interrupt = Set()
+        scheduler.mark()
+        scheduler.pause(0.1)
+
+        self.assertEqual(self.clock.time(), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
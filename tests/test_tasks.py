@@ -0,0 +1,107 @@
+import time
+import unittest
+
+from hexy.comm.i2c import Adafruit_I2C
+from hexy.comm.pwm import PWM
+from hexy.comm.sim import SimulatedBus
+from hexy.robot.core import Drivers, Stopped
+from hexy.robot.dancing import DancingHexapod
+from hexy.robot.tasks import Cancelled, Motion
+
+
+class MotionTest(unittest.TestCase):
+    """ cancelling routines on the motion thread and the emergency stop latch, on the
+        simulated bus in real time """
+
+    def setUp(self):
+
+        self.bus = SimulatedBus().install()
+        PWM.allcall_i2c = {}
+
+        self.robot = DancingHexapod(drivers = Drivers())
+        self.robot.default()
+        self.robot.squat(30) # knees away from the stance plant() puts them in
+
+        self.motion = Motion(self.robot)
+
+    def tearDown(self):
+
+        self.motion.cancel(stance = False)
+        self.robot.release()
+        self.motion.close()
+
+        SimulatedBus.installed.clear()
+        Adafruit_I2C.setBusFactory(None)
+        PWM.allcall_i2c = {}
+
+    def started(self, task):
+
+        for _ in xrange(200):
+            if task.step is not None: return
+            time.sleep(0.005)
+
+        self.fail('%r never started' % task)
+
+    def driven(self):
+        """ channels of the first chip putting out a pulse """
+
+        registers = self.bus.devices[0x40].registers
+        return [ch for ch in xrange(16) if not registers[9 + 4*ch] & 0x10
+                and registers[8 + 4*ch] | registers[9 + 4*ch] << 8]
+
+    def test_cancel_plants_the_feet(self):
+
+        task = self.motion.wave(repetitions = 100)
+        self.started(task)
+        task.cancel()
+
+        self.assertTrue(task.wait(2))
+        self.assertIsInstance(task.error, Cancelled)
+        self.assertEqual([knee.angle for knee in self.robot.knees], [60] * 6)
+
+    def test_cancel_without_stance_leaves_the_pose(self):
+
+        task = self.motion.wave(repetitions = 100)
+        self.started(task)
+        self.motion.cancel(stance = False)
+
+        self.assertTrue(task.wait(2))
+        self.assertEqual(task.state(), 'cancelled')
+        self.assertEqual(self.robot.right_front.knee.angle, 30)
+
+    def test_queued_tasks_run_by_priority(self):
+
+        order = []
+        blocker = self.motion.wave(repetitions = 100)
+        self.started(blocker)
+
+        low = self.motion.submit([('look', (10,), {})], priority = 0)
+        high = self.motion.submit([('look', (20,), {})], priority = 5)
+
+        for task in (low, high):
+            task.add_done_callback(lambda task: order.append(task.priority))
+
+        blocker.cancel()
+        self.assertTrue(low.wait(2))
+        self.assertEqual(order, [5, 0])
+
+    def test_emergency_stop_latches_until_release(self):
+
+        task = self.motion.walk(repetitions = 100)
+        self.started(task)
+
+        self.robot.emergency_stop()
+        self.assertTrue(task.wait(2))
+        self.assertIsInstance(task.error, Stopped)
+
+        time.sleep(0.3)
+        self.assertEqual(self.driven(), [])
+        self.assertRaises(Stopped, self.robot.squat, 40)
+
+        self.robot.release()
+        self.robot.squat(40)
+        self.assertNotEqual(self.driven(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
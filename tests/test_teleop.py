@@ -0,0 +1,78 @@
+import unittest
+
+from hexy import teleop
+from hexy.comm.i2c import Adafruit_I2C
+from hexy.comm.pwm import PWM
+from hexy.comm.sim import SimulatedBus
+from hexy.robot.core import Drivers
+from hexy.robot.dancing import DancingHexapod
+
+
+class TeleopTest(unittest.TestCase):
+    """ decoding datagrams and the control loop of a TeleopServer on the simulated bus,
+        commands handed to the loop directly instead of over the socket """
+
+    def setUp(self):
+
+        SimulatedBus().install()
+        PWM.allcall_i2c = {}
+
+        self.robot = DancingHexapod(drivers = Drivers())
+        self.robot.default()
+        self.server = teleop.TeleopServer(self.robot, address = ('127.0.0.1', 0))
+
+    def tearDown(self):
+
+        self.server.close()
+
+        SimulatedBus.installed.clear()
+        Adafruit_I2C.setBusFactory(None)
+        PWM.allcall_i2c = {}
+
+    def command(self, kind, values):
+
+        seq, kind, values = teleop.decode(teleop.encode(kind, 1, values))
+        self.server.latest = (teleop.clock.now(), seq, kind, values)
+        self.server.tick()
+
+    def test_vectors_that_are_not_finite_or_too_large_are_malformed(self):
+
+        for values in [(float('nan'), 0, 0), (0, float('inf'), 0), (0, 0, 1e6)]:
+            datagram = teleop.HEADER.pack(teleop.MAGIC, teleop.VERSION, teleop.VELOCITY, 1) + \
+                       teleop.VECTOR.pack(*values)
+            self.assertRaises(teleop.Malformed, teleop.decode, datagram)
+
+        datagram = teleop.encode(teleop.POSE, 1, (0, 0, 101))
+        self.assertRaises(teleop.Malformed, teleop.decode, datagram)
+
+        self.assertEqual(teleop.decode(teleop.encode(teleop.VELOCITY, 7, (20, 0, 5))),
+                         (7, teleop.VELOCITY, (20.0, 0.0, 5.0)))
+
+    def test_a_failing_tick_stands_instead_of_raising(self):
+
+        def fail(): raise ValueError('math domain error')
+
+        self.command(teleop.VELOCITY, (20, 0, 0))
+        self.server.gait.tick = fail
+        self.command(teleop.VELOCITY, (20, 0, 0))
+
+        self.assertEqual(self.server.failed, 1)
+        self.assertFalse(self.server.walking)
+        self.assertEqual([knee.angle for knee in self.robot.knees], [60] * 6)
+
+    def test_pulses_reach_the_knee_leeway(self):
+
+        knee = self.robot.right_front.knee
+        table = self.robot.state.tables[knee.channel]
+        low, high = min(table[0], table[-1]), max(table[0], table[-1])
+
+        self.command(teleop.PULSES, {knee.channel: high + 50})
+        self.assertEqual(knee.pulse, high)
+        self.assertEqual(abs(knee.angle), knee.max + knee.leeway)
+
+        self.command(teleop.PULSES, {knee.channel: low})
+        self.assertEqual(knee.pulse, low)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+
+from hexy.comm import clock
+from hexy.comm.i2c import Adafruit_I2C
+from hexy.comm.pwm import PWM
+from hexy.comm.sim import SimulatedBus
+from hexy.robot.core import Drivers
+from hexy.robot.dancing import DancingHexapod
+from hexy.robot.timeline import Timeline
+
+
+class TimelineTest(unittest.TestCase):
+    """ when merged tracks go out, on a simulated bus and a virtual clock """
+
+    def setUp(self):
+
+        self.previous, self.clock = clock.current, clock.VirtualClock().install()
+        SimulatedBus().install()
+        PWM.allcall_i2c = {}
+
+        self.robot = DancingHexapod(drivers = Drivers())
+        self.robot.default()
+        self.robot.scheduler.restart()
+
+        self.sent, output = [], self.robot.state.output
+
+        def sent(pulses):
+            self.sent.append((round(self.clock.time() - self.start, 6), sorted(pulses)))
+            output(pulses)
+
+        self.robot.state.output = sent
+        self.start = self.clock.time()
+
+    def tearDown(self):
+
+        self.previous.install()
+        SimulatedBus.installed.clear()
+        Adafruit_I2C.setBusFactory(None)
+        PWM.allcall_i2c = {}
+
+    def test_staggered_legs_go_out_as_one_frame_per_keyframe_time(self):
+
+        first, second = self.robot.left_back, self.robot.right_back
+        timeline = Timeline(self.robot)
+        timeline.leg(first).replant(-30, 0, 45, 0.2)
+        timeline.leg(second, start = 0.2).replant(-30, 0, -45, 0.2)
+
+        timeline.play()
+
+        channels = lambda *legs: sorted(joint.channel for leg in legs for joint in leg.joints)
+        knee_and_ankle = lambda leg: sorted([leg.knee.channel, leg.ankle.channel])
+
+        self.assertEqual(self.sent, [(0.0, knee_and_ankle(first)),
+                                     (0.2, sorted(channels(first) + knee_and_ankle(second))),
+                                     (0.4, channels(second))])
+
+        self.assertAlmostEqual(self.clock.time() - self.start, 0.6)
+        self.assertEqual((first.hip.angle, second.hip.angle), (45, -45))
+
+    def test_a_later_track_wins_a_shared_channel(self):
+
+        neck = self.robot.neck
+        timeline = Timeline(self.robot)
+        timeline.joint(neck).pose(30).hold(0.1).pose(0)
+        timeline.joint(neck, start = 0.1).pose(-20)
+
+        self.assertEqual([(time, angles) for time, _, angles, _ in timeline.frames()], [(0.0, [30]), (0.1, [-20])])
+
+        timeline.play()
+        self.assertEqual(neck.angle, -20)
+
+    def test_holds_at_the_end_are_waited_out(self):
+
+        timeline = Timeline(self.robot)
+        timeline.group(self.robot.knees).pose(40).hold(0.25)
+        timeline.joint(self.robot.neck, start = 0.1).pose(10).hold(0.5)
+
+        self.assertAlmostEqual(timeline.duration(), 0.6)
+
+        timeline.play()
+        self.assertEqual([time for time, _ in self.sent], [0.0, 0.1])
+        self.assertAlmostEqual(self.clock.time() - self.start, 0.6)
+
+
+if __name__ == '__main__':
+    unittest.main()
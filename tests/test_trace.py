@@ -0,0 +1,50 @@
+import sys
+import unittest
+from StringIO import StringIO
+
+from hexy.comm import trace
+from hexy.comm.i2c import Adafruit_I2C
+from hexy.comm.sim import SimulatedBus
+from hexy.comm.trace import Tracer
+
+
+class ErrorTest(unittest.TestCase):
+    """ failed transactions of Adafruit_I2C, on a simulated bus without a chip at 0x55 """
+
+    def setUp(self):
+
+        SimulatedBus().install()
+        self.stdout, sys.stdout = sys.stdout, StringIO()
+
+    def tearDown(self):
+
+        sys.stdout = self.stdout
+        if trace.active is not None: trace.active.uninstall()
+
+        SimulatedBus.installed.clear()
+        Adafruit_I2C.setBusFactory(None)
+
+    def test_errors_are_counted_and_traced_without_printing(self):
+
+        plain = Adafruit_I2C(0x55)
+        tracer = Tracer().install()
+        traced = Adafruit_I2C(0x55)
+
+        self.assertEqual((plain.readU8(0), traced.write8(0, 1)), (-1, -1))
+
+        self.assertEqual((plain.errors, traced.errors), (1, 1))
+        self.assertEqual(tracer.snapshot()['totals']['errors'], 2) # the traced bus counted its own
+        self.assertEqual([name for name, category, _, _, _, _ in tracer.events if category == 'error'],
+                         ['error 0x55', 'error 0x55'])
+        self.assertEqual(sys.stdout.getvalue(), '')
+
+    def test_debug_prints_them(self):
+
+        device = Adafruit_I2C(0x55, debug = True)
+        device.readU8(0)
+
+        self.assertIn('0x55', sys.stdout.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+
+from hexy.comm import clock
+from hexy.comm.i2c import Adafruit_I2C
+from hexy.comm.pwm import PWM
+from hexy.comm.sim import SimulatedBus
+from hexy.robot.core import Drivers
+from hexy.robot.dancing import DancingHexapod
+from hexy.robot.trajectory import PEAKS, Trajectory, ease
+
+
+class TrajectoryTest(unittest.TestCase):
+    """ the frames and timing of planned moves, on a simulated bus and a virtual clock """
+
+    def setUp(self):
+
+        self.previous, self.clock = clock.current, clock.VirtualClock().install()
+        SimulatedBus().install()
+        PWM.allcall_i2c = {}
+
+        self.robot = DancingHexapod(drivers = Drivers())
+        self.robot.default()
+        self.knee = self.robot.right_front.knee
+
+    def tearDown(self):
+
+        self.previous.install()
+        SimulatedBus.installed.clear()
+        Adafruit_I2C.setBusFactory(None)
+        PWM.allcall_i2c = {}
+
+    def timed(self, routine, *args, **kwargs):
+        """ seconds routine took on the virtual clock """
+
+        self.robot.scheduler.restart()
+        start = self.clock.time()
+        routine(*args, **kwargs)
+        return self.clock.time() - start
+
+    def test_profiles_start_slow_and_end_on_the_target(self):
+
+        for name in PEAKS:
+            curve = ease(name, 30)
+
+            self.assertEqual(len(curve), 30)
+            self.assertAlmostEqual(curve[-1], 1.0)
+            self.assertEqual(list(curve), sorted(curve))
+
+        self.assertLess(ease('minjerk', 30)[0], ease('cosine', 30)[0])
+        self.assertLess(ease('cosine', 30)[0], ease('linear', 30)[0])
+
+    def test_a_frame_per_period_ending_on_the_exact_target(self):
+
+        start = self.knee.angle
+        trajectory = Trajectory(self.robot.state, {self.knee.channel: start - 10.5}, 0.5, rate = 60)
+
+        self.assertEqual(len(trajectory.frames), 30)
+        self.assertEqual(trajectory.frames[-1][0], [start - 10.5])
+
+    def test_a_short_duration_is_stretched_to_the_speed_limit(self):
+
+        start = self.knee.angle
+        trajectory = Trajectory(self.robot.state, {self.knee.channel: start - 40}, 0.05, rate = 60)
+
+        limit = 40 * PEAKS['minjerk'] / self.robot.state.speeds[self.knee.channel]
+        self.assertAlmostEqual(trajectory.duration, limit)
+        self.assertEqual(len(trajectory.frames), 12)
+
+    def test_a_glide_takes_its_duration(self):
+
+        self.assertAlmostEqual(self.timed(self.robot.squat, -40, duration = 0.5), 0.5)
+        self.assertAlmostEqual(self.timed(self.robot.lie_down, duration = 0.8), 0.8 + 0.15)
+
+    def test_step_still_sets_the_pace(self):
+
+        # the old loop's 50 steps of 2 degrees become 50 frames
+        self.assertAlmostEqual(self.timed(self.robot.lie_down, step = 2), 50 / 60. + 0.15)
+
+        # 70 frames up, after a tuck of a third of that and before the 1.05 s of default()
+        self.assertAlmostEqual(self.timed(self.robot.get_up, step = 2), (24 + 70) / 60. + 1.05)
+
+
+if __name__ == '__main__':
+    unittest.main()